@@ -1,41 +1,447 @@
-from flask import Flask, jsonify
+import math
+import os
+import sys
+import time
+
+from flask import Flask, Response, g, jsonify, request
 import pandas as pd
 from flask_cors import CORS
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from artifact_cache import ArtifactCache
+from batching import MAX_BATCH_ROWS, MAX_WAIT, MicroBatcher
+from payload import Payload
+from history_index import history_index
+from inference import load_bundle, load_history, build_race_features
+from storage import version_file
+from simulate import simulate_race
+from scenario import ScenarioEngine, parse_overrides
+from score_calendar import CALENDAR_DATASET, index_calendar, load_calendar
+from f1_schedule import F1_SCHEDULE
+from metrics import Registry
+
+PREDICTIONS_FILE = "backend/data/las_vegas_2025_predictions.csv"
+DRIVERS_FILE = "backend/data/drivers.csv"
+HISTORY_FILE = "backend/data/f1_data_cleaned.csv"
+MODEL_FILES = [
+    "backend/data/scaler.pkl",
+    "backend/data/random_forest_model.pkl",
+    "backend/data/feature_columns.pkl",
+]
+FOREST_EXPORT_DIR = "backend/data/random_forest_model"
+
+EVENT_NAMES = {(season, rnd): name for season, rnd, name in F1_SCHEDULE}
+MAX_SIMULATIONS = 2_000_000
+
 app = Flask(__name__)
 CORS(app)
+
+metrics = Registry()
+REQUEST_LATENCY = metrics.histogram("f1_http_request_duration_seconds", "Request latency by route",
+                                    ["route", "method", "status"])
+REQUEST_STAGE = metrics.histogram("f1_request_stage_seconds",
+                                  "Time per request stage (predict is model inference)", ["route", "stage"])
+HTTP_CACHE = metrics.counter("f1_http_cache", "Conditional requests answered with 304 (hit) or a body (miss)",
+                             ["route", "result"])
+ARTIFACT_LOOKUPS = metrics.counter("f1_artifact_lookups", "Artifact reads served from memory (hit) or built (miss)",
+                                   ["artifact", "result"])
+ARTIFACT_BUILD = metrics.histogram("f1_artifact_build_seconds", "Artifact load (initial) and reload times",
+                                   ["artifact", "kind", "outcome"])
+BATCH_REQUESTS = metrics.histogram("f1_batch_requests", "Prediction requests served by one model call",
+                                   buckets=(1, 2, 4, 8, 16, 32, 64))
+BATCH_OCCUPANCY = metrics.histogram("f1_batch_occupancy", "Rows per model call as a share of the batch limit",
+                                    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0))
+BATCH_WAIT = metrics.histogram("f1_batch_wait_seconds", "Time the oldest request of a batch spent queued")
+
+def to_json_bytes(obj):
+    """Serialize exactly like jsonify does, once, so requests only copy bytes"""
+    return (app.json.dumps(obj, separators=(",", ":")) + "\n").encode("utf-8")
+
 def get_model_predictions():
-    df = pd.read_csv("backend/data/las_vegas_2025_predictions.csv")
+    df = pd.read_csv(PREDICTIONS_FILE)
     return df[["FullName", "win_probability"]].rename(
         columns={"FullName": "name", "win_probability": "probability"}
     ).to_dict(orient="records")
 
-@app.route('/api/predictions')
+def get_drivers():
+    df = pd.read_csv(DRIVERS_FILE)
+    return df.to_dict(orient="records")
+
+RACE_INFO = {
+    "name": "Las Vegas Grand Prix 2025",
+    "circuit_length": "6.12 km",
+    "laps": 50,
+    "distance": "306 km",
+    "track_map": "https://www.formula1.com/content/dam/fom-website/manual/Misc/Track%20maps/LasVegas_Circuit.png",
+    "highlights": "The race returned to F1 in 2023 after decades of absence, quickly becoming a fan favorite due to its vibrant atmosphere and night-time setting.",
+    "description": "The Las Vegas Grand Prix is a spectacular night race held on the streets of Las Vegas. The circuit combines a high-speed oval section with tight corners on the city streets, presenting unique challenges to drivers and teams.",
+}
+
+def calendar_payloads(table, paths):
+    """One pre-serialized payload per race, plus the race list under None"""
+    payloads = {}
+    races = []
+    for (season, rnd), race in index_calendar(table).items():
+        name = race['EventName'].iloc[0]
+        payloads[(season, rnd)] = Payload.from_files(to_json_bytes({
+            "season": season,
+            "round": rnd,
+            "race": name,
+            "predictions": [
+                {"name": row.FullName, "team": row.TeamName,
+                 "grid_position": row.GridPosition, "probability": row.win_probability}
+                for row in race.itertuples(index=False)
+            ],
+        }), paths)
+        races.append({"season": season, "round": rnd, "race": name,
+                      "favourite": race['FullName'].iloc[0], "probability": race['win_probability'].iloc[0]})
+    payloads[None] = Payload.from_files(to_json_bytes(races), paths)
+    return payloads
+
+def build_history(paths):
+    history = load_history()
+    # Built with the artifact, so no request pays for the per-driver/per-team index
+    history_index(history)
+    return history
+
+def record_artifact_build(name, seconds, reload, error):
+    ARTIFACT_BUILD.observe(seconds, artifact=name, kind="reload" if reload else "initial",
+                           outcome="error" if error else "ok")
+
+def record_artifact_lookup(name, hit):
+    ARTIFACT_LOOKUPS.inc(artifact=name, result="hit" if hit else "miss")
+
+def record_batch(requests, rows, waited):
+    BATCH_REQUESTS.observe(requests)
+    BATCH_OCCUPANCY.observe(rows / batcher.max_batch_rows)
+    BATCH_WAIT.observe(waited)
+
+artifacts = ArtifactCache(on_build=record_artifact_build, on_lookup=record_artifact_lookup)
+# Concurrent /api/predict and /api/simulate requests share model calls; F1_BATCH_MAX_ROWS=0 turns this off
+batcher = MicroBatcher(max_batch_rows=int(os.environ.get("F1_BATCH_MAX_ROWS", MAX_BATCH_ROWS)),
+                       max_wait=float(os.environ.get("F1_BATCH_WAIT_MS", MAX_WAIT * 1000)) / 1000,
+                       on_batch=record_batch)
+artifacts.register("predictions", [PREDICTIONS_FILE],
+                   lambda paths: Payload.from_files(to_json_bytes(get_model_predictions()), paths))
+artifacts.register("drivers", [DRIVERS_FILE],
+                   lambda paths: Payload.from_files(to_json_bytes(get_drivers()), paths))
+artifacts.register("race-info", [], lambda paths: Payload(to_json_bytes(RACE_INFO)))
+artifacts.register("model", MODEL_FILES + [os.path.join(FOREST_EXPORT_DIR, "manifest.json")],
+                   lambda paths: load_bundle(*MODEL_FILES, export_dir=FOREST_EXPORT_DIR))
+artifacts.register("history", [HISTORY_FILE, version_file("cleaned")], build_history)
+# Scored by score_calendar.py; rescored at load time when its table is missing or older than
+# the history and model it would be scored from
+artifacts.register("calendar", [version_file(CALENDAR_DATASET), HISTORY_FILE, version_file("cleaned")] + MODEL_FILES
+                   + [os.path.join(FOREST_EXPORT_DIR, "manifest.json")],
+                   lambda paths: calendar_payloads(load_calendar(paths[1:]), paths))
+
+def not_modified(payload):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a payload"""
+    if request.if_none_match:
+        return any(request.if_none_match.contains(tag) for tag in payload.all_etags())
+    if request.if_modified_since is not None:
+        return payload.last_modified <= request.if_modified_since.timestamp()
+    return False
+
+def json_artifact_response(name):
+    return payload_response(artifacts.get(name).value)
+
+def payload_response(payload):
+    encoding = payload.choose_encoding(request.accept_encodings)
+
+    if not_modified(payload):
+        response = Response(status=304)
+        HTTP_CACHE.inc(route=request.url_rule.rule, result="hit")
+    else:
+        HTTP_CACHE.inc(route=request.url_rule.rule, result="miss")
+        response = Response(payload.encoded[encoding], mimetype="application/json")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(payload.etag_for(encoding))
+    response.headers["Last-Modified"] = payload.last_modified_http
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+# The Flutter client requests these with a trailing slash
+@app.route('/api/predictions', strict_slashes=False)
 def api_predictions():
-    results = get_model_predictions()
-    return jsonify(results)
+    return json_artifact_response("predictions")
 
-@app.route('/api/drivers')
+@app.route('/api/drivers', strict_slashes=False)
 def api_drivers():
-    df = pd.read_csv("backend/data/drivers.csv")
-    return jsonify(df.to_dict(orient="records"))
+    return json_artifact_response("drivers")
 
-@app.route('/api/race-info')
+@app.route('/api/race-info', strict_slashes=False)
 def api_race_info():
-    info = {
-        "name": "Las Vegas Grand Prix 2025",
-        "circuit_length": "6.12 km",
-        "laps": 50,
-        "distance": "306 km",
-        "track_map": "https://www.formula1.com/content/dam/fom-website/manual/Misc/Track%20maps/LasVegas_Circuit.png",
-        "highlights": "The race returned to F1 in 2023 after decades of absence, quickly becoming a fan favorite due to its vibrant atmosphere and night-time setting.",
-        "description": "The Las Vegas Grand Prix is a spectacular night race held on the streets of Las Vegas. The circuit combines a high-speed oval section with tight corners on the city streets, presenting unique challenges to drivers and teams.",
-    }
-    return jsonify(info)
+    return json_artifact_response("race-info")
+
+def calendar_payloads_or_none():
+    """The calendar payloads, or None while the calendar cannot be built (retried on the next request)"""
+    try:
+        return artifacts.get("calendar").value
+    except Exception as e:
+        print(f"✗ Calendar unavailable: {e}")
+        return None
+
+@app.route('/api/calendar', strict_slashes=False)
+def api_calendar():
+    payloads = calendar_payloads_or_none()
+    if payloads is None:
+        return jsonify({"error": "calendar predictions are not available"}), 503
+    return payload_response(payloads[None])
+
+@app.route('/api/calendar/<int:season>/<int:rnd>', strict_slashes=False)
+def api_calendar_race(season, rnd):
+    payloads = calendar_payloads_or_none()
+    if payloads is None:
+        return jsonify({"error": "calendar predictions are not available"}), 503
+    payload = payloads.get((season, rnd))
+    if payload is None:
+        return jsonify({"error": f"no prediction for season {season} round {rnd}"}), 404
+    return payload_response(payload)
+
+class ServerTiming:
+    """Collects per-stage durations for the Server-Timing response header"""
+
+    def __init__(self):
+        self.timings = []
+        self.start = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings.append(f"{stage};dur={(now - self.start) * 1000:.2f}")
+        REQUEST_STAGE.observe(now - self.start, route=request.url_rule.rule, stage=stage)
+        self.start = now
+
+    def header(self):
+        return ", ".join(self.timings)
+
+def parse_integer(value, message):
+    """An int from a JSON integer or query-string digits; ValueError(message) otherwise"""
+    if isinstance(value, (bool, float)):
+        raise ValueError(message)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(message)
+
+def parse_race(season, rnd):
+    """(season, round) as ints from JSON integers or query-string digits; ValueError otherwise"""
+    message = "season and round must be integers"
+    return parse_integer(season, message), parse_integer(rnd, message)
+
+def parse_predict_request():
+    """(season, round, grid DataFrame or None) from the query string or a JSON body"""
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            raise ValueError("expected a JSON object body")
+        season, rnd, entries = body.get("season"), body.get("round"), body.get("grid")
+    else:
+        season, rnd, entries = request.args.get("season"), request.args.get("round"), None
+
+    season, rnd = parse_race(season, rnd)
+
+    grid = None
+    if entries is not None:
+        if not isinstance(entries, list) or not entries:
+            raise ValueError("grid must be a non-empty list")
+        rows, seen = [], set()
+        for entry in entries:
+            if not isinstance(entry, dict) or "name" not in entry:
+                raise ValueError("each grid entry needs a name")
+            name, position, team = entry["name"], entry.get("grid_position", len(rows) + 1), entry.get("team")
+            if not isinstance(name, str) or not name:
+                raise ValueError("name must be a non-empty string")
+            if isinstance(position, bool) or not isinstance(position, (int, float)) or not math.isfinite(position):
+                raise ValueError(f"grid_position of {name} must be a finite number")
+            if not 1 <= position <= len(entries):
+                raise ValueError(f"grid_position of {name} must be between 1 and {len(entries)}")
+            if team is not None and not isinstance(team, str):
+                raise ValueError(f"team of {name} must be a string")
+            if name in seen:
+                raise ValueError(f"{name} appears more than once in the grid")
+            seen.add(name)
+            rows.append({"FullName": name, "GridPosition": float(position), "TeamName": team})
+        grid = pd.DataFrame(rows)
+    return season, rnd, grid
+
+def race_exists(history, season, rnd):
+    """A scheduled race, or one with results in the history"""
+    if (season, rnd) in EVENT_NAMES:
+        return True
+    rows = history_index(history).race_rows(season, rnd)
+    return rows.start < rows.stop
+
+@app.route('/api/predict', methods=['GET', 'POST'], strict_slashes=False)
+def api_predict():
+    timing = ServerTiming()
+    try:
+        season, rnd, grid = parse_predict_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    bundle = artifacts.get("model").value
+    history = artifacts.get("history").value
+    timing.lap("load")
+
+    if not race_exists(history, season, rnd):
+        return jsonify({"error": f"no race {rnd} in season {season}"}), 404
+    features = build_race_features(history, season, rnd, grid)
+    if features.empty:
+        return jsonify({"error": f"no drivers known for season {season}"}), 404
+    timing.lap("features")
+
+    features["win_probability"] = batcher.predict_proba(bundle, features)
+    timing.lap("predict")
+
+    features = features.sort_values("win_probability", ascending=False)
+    response = jsonify({
+        "season": season,
+        "round": rnd,
+        "race": EVENT_NAMES.get((season, rnd)),
+        "predictions": [
+            {"name": row.FullName, "team": row.TeamName,
+             "grid_position": row.GridPosition, "probability": row.win_probability}
+            for row in features.itertuples(index=False)
+        ],
+    })
+    timing.lap("serialize")
+    response.headers["Server-Timing"] = timing.header()
+    return response
+
+@app.route('/api/simulate', methods=['GET', 'POST'], strict_slashes=False)
+def api_simulate():
+    timing = ServerTiming()
+    try:
+        season, rnd, grid = parse_predict_request()
+        # Same place as season and round: the JSON body for POST, else the query string
+        params = request.get_json(silent=True) if request.method == "POST" else request.args
+        n_sims = parse_integer(params.get("n", 100_000), "n must be an integer")
+        seed = params.get("seed")
+        if seed is not None:
+            seed = parse_integer(seed, "seed must be a non-negative integer")
+            if seed < 0:
+                raise ValueError("seed must be a non-negative integer")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 1 <= n_sims <= MAX_SIMULATIONS:
+        return jsonify({"error": f"n must be between 1 and {MAX_SIMULATIONS}"}), 400
+
+    bundle = artifacts.get("model").value
+    history = artifacts.get("history").value
+    timing.lap("load")
+
+    if not race_exists(history, season, rnd):
+        return jsonify({"error": f"no race {rnd} in season {season}"}), 404
+    features = build_race_features(history, season, rnd, grid)
+    if features.empty:
+        return jsonify({"error": f"no drivers known for season {season}"}), 404
+    timing.lap("features")
+
+    features["win_probability"] = batcher.predict_proba(bundle, features)
+    timing.lap("predict")
+
+    result = simulate_race(features, n_sims, seed)
+    timing.lap("simulate")
+
+    response = jsonify({
+        "season": season,
+        "round": rnd,
+        "race": EVENT_NAMES.get((season, rnd)),
+        "simulations": n_sims,
+        "drivers": result.rename(columns={"FullName": "name"}).to_dict(orient="records"),
+    })
+    timing.lap("serialize")
+    response.headers["Server-Timing"] = timing.header()
+    return response
+
+scenarios = ScenarioEngine()
+
+@app.route('/api/scenario', methods=['POST'], strict_slashes=False)
+def api_scenario():
+    """
+    What-if prediction: {"season", "round", "reverse_grid", "overrides": [
+    {"name", "grid_position" | "pit_lane", "dnf", "team"}]}. Only the
+    overridden drivers are rescored against the race's memoized base.
+    """
+    timing = ServerTiming()
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "expected a JSON object body"}), 400
+    reverse_grid = body.get("reverse_grid", False)
+    try:
+        season, rnd = parse_race(body.get("season"), body.get("round"))
+        overrides = parse_overrides(body.get("overrides"))
+        if not isinstance(reverse_grid, bool):
+            raise ValueError("reverse_grid must be true or false")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    bundle = artifacts.get("model").value
+    history = artifacts.get("history").value
+    timing.lap("load")
+
+    if not race_exists(history, season, rnd):
+        return jsonify({"error": f"no race {rnd} in season {season}"}), 404
+    try:
+        result = scenarios.run(history, bundle, season, rnd, overrides, reverse_grid, predict=batcher.predict_proba)
+    except KeyError as e:
+        return jsonify({"error": f"{e.args[0]} is not in the field of season {season} round {rnd}"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result.empty:
+        return jsonify({"error": f"no drivers known for season {season}"}), 404
+    timing.lap("predict")
+
+    response = jsonify({
+        "season": season,
+        "round": rnd,
+        "race": EVENT_NAMES.get((season, rnd)),
+        "predictions": [
+            {"name": row.FullName, "team": row.TeamName, "grid_position": row.GridPosition,
+             "probability": row.win_probability, "base_probability": row.base_probability,
+             "changed": bool(row.changed)}
+            for row in result.itertuples(index=False)
+        ],
+    })
+    timing.lap("serialize")
+    response.headers["Server-Timing"] = timing.header()
+    return response
 
 @app.route('/')
 def index():
     return "F1 Winner Predictor API is running."
 
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+def start_request_timer():
+    metrics.ensure_flusher()
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=response.status_code)
+    return response
+
+# Build the payloads and load the model at startup instead of on the first request
+for _name in ("predictions", "drivers", "race-info", "model", "history", "calendar"):
+    try:
+        artifacts.get(_name)
+    except Exception as e:
+        # Built again on first use; the routes that do not need it still come up
+        print(f"✗ Loading {_name} at startup failed: {e}")
+# Forked workers start their metrics from zero, so the startup loads are written out here
+metrics.flush()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+
+class Artifact:
+    """A loaded value plus the file signature it was built from"""
+
+    def __init__(self, value, signature, built_at):
+        self.value = value
+        self.signature = signature
+        self.built_at = built_at
+
+
+def file_signature(paths):
+    """(mtime_ns, size) for every source file; None for files that are missing"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ArtifactCache:
+    """
+    Holds artifacts built from files on disk (serialized JSON, models, ...).
+
+    Requests only ever read the current value. A background thread polls
+    the source files' mtime/size and rebuilds an artifact when they change,
+    swapping the new value in once it is fully built, so request latency
+    does not depend on file reloads.
+
+    A failed build is remembered with the signature it failed on: get()
+    re-raises it without rebuilding until the source files change, and
+    the watcher retries it then.
+    """
+
+    def __init__(self, poll_interval=2.0, on_build=None, on_lookup=None):
+        self.poll_interval = poll_interval
+        # Optional hooks for metrics: on_build(name, seconds, reload, error)
+        # after every build attempt, on_lookup(name, hit) on every get()
+        self.on_build = on_build
+        self.on_lookup = on_lookup
+        self._loaders = {}
+        self._artifacts = {}
+        self._failures = {}  # name -> (signature, exception) of the last failed build
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+
+    def register(self, name, paths, build):
+        """Register an artifact: build(paths) is called to (re)create its value"""
+        self._loaders[name] = (tuple(paths), build)
+
+    def get(self, name):
+        """Return the current Artifact, building it on first use"""
+        self._ensure_watcher()
+        artifact = self._artifacts.get(name)
+        hit = artifact is not None
+        if artifact is None:
+            with self._lock:
+                artifact = self._artifacts.get(name)
+                if artifact is None:
+                    failure = self._failures.get(name)
+                    if failure is not None and failure[0] == file_signature(self._loaders[name][0]):
+                        raise failure[1]
+                    artifact = self._build(name)
+        if self.on_lookup:
+            self.on_lookup(name, hit)
+        return artifact
+
+    def refresh(self):
+        """Rebuild every loaded or failed artifact whose source files changed"""
+        signatures = {name: artifact.signature for name, artifact in self._artifacts.items()}
+        for name, (signature, _) in list(self._failures.items()):
+            signatures.setdefault(name, signature)
+        for name, signature in signatures.items():
+            paths, _ = self._loaders[name]
+            if file_signature(paths) != signature:
+                try:
+                    self._build(name)
+                except Exception as e:
+                    # Keep serving the previous version (e.g. a file caught mid-write)
+                    print(f"✗ Reload of {name} failed: {e}")
+
+    def _build(self, name):
+        paths, build = self._loaders[name]
+        signature = file_signature(paths)
+        reload = name in self._artifacts
+        start = time.perf_counter()
+        try:
+            artifact = Artifact(build(paths), signature, time.time())
+        except Exception as e:
+            self._failures[name] = (signature, e)
+            if self.on_build:
+                self.on_build(name, time.perf_counter() - start, reload, e)
+            raise
+        self._failures.pop(name, None)
+        self._artifacts[name] = artifact
+        if self.on_build:
+            self.on_build(name, time.perf_counter() - start, reload, None)
+        return artifact
+
+    def _ensure_watcher(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            thread = threading.Thread(target=self._watch, daemon=True)
+            thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.refresh()
@@ -0,0 +1,151 @@
+import argparse
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from entities import load_entities
+from features import add_asof_features
+from history_index import race_keys
+from inference import DEFAULT_GRID
+from las_vegas_predict import event_name
+from storage import DATA_DIR, read_stage
+
+RESULTS_FILE = os.path.join(DATA_DIR, "backtest_results.csv")
+FEATURE_COLUMNS = os.path.join(DATA_DIR, "feature_columns.pkl")
+# Keeps log loss finite when the winner was given probability 0
+MIN_PROBABILITY = 1e-6
+RESULT_COLUMNS = ['Season', 'Round', 'EventName', 'n_train', 'predicted_winner', 'actual_winner', 'hit',
+                  'winner_probability', 'log_loss']
+
+
+def load_backtest_data():
+    """
+    Every race with as-of features: each row only knows races before it.
+    One row per driver per race, so a race's probabilities form one field.
+    """
+    df = load_entities().categorize(read_stage('combined'))
+    df = df.drop_duplicates(['Season', 'Round', 'FullName']).copy()
+    df = add_asof_features(df)
+    df['GridPosition'] = df['GridPosition'].fillna(DEFAULT_GRID)
+    df['is_winner'] = (df['Position'] == 1.0).astype(int)
+    race_ids = race_keys(df['Season'], df['Round'])
+    return df, race_ids
+
+
+def make_model(kind, seed=42):
+    if kind == 'logistic':
+        # warm_start: the next cutoff starts from this cutoff's coefficients
+        return LogisticRegression(max_iter=1000, class_weight='balanced', warm_start=True)
+    # Same settings as model.py
+    return RandomForestClassifier(n_estimators=100, max_depth=15, min_samples_split=10,
+                                  min_samples_leaf=4, class_weight='balanced',
+                                  random_state=seed, n_jobs=1)
+
+
+def score_race(race, probability):
+    """Hit and log loss for one race; probabilities are renormalised over the field"""
+    probability = probability / probability.sum() if probability.sum() > 0 else np.full(len(race), 1 / len(race))
+    predicted = race['FullName'].iloc[int(np.argmax(probability))]
+    winners = race.loc[race['is_winner'] == 1, 'FullName']
+    winner_probability = probability[(race['is_winner'] == 1).to_numpy()].sum()
+    return {
+        'predicted_winner': predicted,
+        'actual_winner': winners.iloc[0] if len(winners) else None,
+        'hit': int(predicted in set(winners)),
+        'winner_probability': winner_probability,
+        'log_loss': -np.log(max(winner_probability, MIN_PROBABILITY)),
+    }
+
+
+def run_chunk(X, y, race_ids, races, cutoffs, model_kind):
+    """
+    Backtest a contiguous run of cutoffs in one process: for each race,
+    fit on every earlier race and predict that one. Rows are sorted by
+    race, so each training set is a prefix of X.
+    """
+    model = make_model(model_kind)
+    rows = []
+    for cutoff in cutoffs:
+        train_end = np.searchsorted(race_ids, cutoff)
+        test = race_ids == cutoff
+        scaler = StandardScaler().fit(X[:train_end])
+        model.fit(scaler.transform(X[:train_end]), y[:train_end])
+        probability = model.predict_proba(scaler.transform(X[test]))[:, 1]
+        race = races[test]
+        rows.append({
+            'Season': cutoff // 100,
+            'Round': cutoff % 100,
+            'n_train': int(train_end),
+            **score_race(race, probability),
+        })
+    return rows
+
+
+def run_backtest(df, race_ids, feature_columns, start_season=2021, model_kind='forest', workers=None):
+    """
+    Walk forward over every race from start_season on. Cutoffs are
+    independent, so they are split into one contiguous chunk per worker;
+    contiguous chunks keep warm starts close to the previous fit.
+    """
+    X = df[feature_columns].to_numpy(dtype=np.float64)
+    y = df['is_winner'].to_numpy()
+    races = df[['FullName', 'is_winner']].reset_index(drop=True)
+    cutoffs = [c for c in np.unique(race_ids) if c // 100 >= start_season and y[race_ids == c].any()]
+    if not cutoffs:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    workers = min(workers or os.cpu_count() or 1, len(cutoffs))
+    chunks = [list(chunk) for chunk in np.array_split(cutoffs, workers) if len(chunk)]
+    if workers == 1:
+        rows = run_chunk(X, y, race_ids, races, cutoffs, model_kind)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunk, X, y, race_ids, races, chunk, model_kind) for chunk in chunks]
+            rows = [row for future in futures for row in future.result()]
+
+    results = pd.DataFrame(rows)
+    results.insert(2, 'EventName', [event_name(s, r) for s, r in zip(results['Season'], results['Round'])])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest: predict each race from the races before it")
+    parser.add_argument("--start-season", type=int, default=2021)
+    parser.add_argument("--model", choices=['forest', 'logistic'], default='forest')
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(f"WALK-FORWARD BACKTEST ({args.model}, from {args.start_season})")
+    print("="*70)
+
+    with open(FEATURE_COLUMNS, "rb") as f:
+        feature_columns = pickle.load(f)
+    df, race_ids = load_backtest_data()
+
+    start = time.perf_counter()
+    results = run_backtest(df, race_ids, feature_columns, args.start_season, args.model, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Backtested {len(results)} races in {elapsed:.1f}s")
+    if results.empty:
+        print(f"No races with a winner from {args.start_season} on; nothing to report")
+        raise SystemExit(0)
+
+    print("\nPer season:")
+    summary = results.groupby('Season').agg(races=('hit', 'size'), hit_rate=('hit', 'mean'),
+                                            log_loss=('log_loss', 'mean'))
+    print(summary.to_string(float_format=lambda x: f"{x:.3f}"))
+    print(f"\nOverall winner hit rate: {results['hit'].mean():.3f}")
+    print(f"Overall winner log loss: {results['log_loss'].mean():.3f}"
+          f" (uniform guess over 20 drivers: {np.log(20):.3f})")
+
+    results.to_csv(args.output, index=False)
+    print(f"\n✓ Saved per-race results to {args.output}")
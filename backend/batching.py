@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# Defaults for the API; override with F1_BATCH_MAX_ROWS / F1_BATCH_WAIT_MS
+MAX_BATCH_ROWS = 512
+MAX_WAIT = 0.002
+
+
+class _Request:
+    __slots__ = ('bundle', 'X', 'queued_at', 'done', 'result', 'error')
+
+    def __init__(self, bundle, X):
+        self.bundle = bundle
+        self.X = X
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests into one model call.
+
+    A request's feature rows are queued; a worker thread takes up to
+    max_batch_rows queued rows, stacks them into one matrix per model,
+    calls predict_matrix once and hands every request its slice back.
+    Requests that arrive during a model call form the next batch. When
+    the last batch held more than one request (a burst), the worker also
+    lingers up to max_wait after the oldest queued request to fill the
+    batch; a lone request is never held back.
+
+    max_batch_rows <= 0 turns batching off: predict_proba calls the model directly.
+    """
+
+    def __init__(self, max_batch_rows=MAX_BATCH_ROWS, max_wait=MAX_WAIT, on_batch=None):
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        # Optional hook for metrics: on_batch(requests, rows, waited) after every model call
+        self.on_batch = on_batch
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._linger = False
+
+    def predict_proba(self, bundle, features):
+        """Win probability for every row of a feature DataFrame, possibly batched with other requests"""
+        X = features[bundle.feature_columns].to_numpy(dtype=np.float64)
+        if self.max_batch_rows <= 0:
+            result = self._call(bundle, [X])[0]
+            if self.on_batch:
+                self.on_batch(1, len(X), 0.0)
+            return result
+
+        self._ensure_worker()
+        request = _Request(bundle, X)
+        with self._ready:
+            self._pending.append(request)
+            self._pending_rows += len(X)
+            self._ready.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _ensure_worker(self):
+        """Start the worker thread (once per pid: a forked child starts with a fresh queue)"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._ready = threading.Condition()
+            self._pending = []
+            self._pending_rows = 0
+            threading.Thread(target=self._run, daemon=True).start()
+            self._worker_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._pending:
+                    self._ready.wait()
+                deadline = self._pending[0].queued_at + (self.max_wait if self._linger else 0)
+                while self._pending_rows < self.max_batch_rows:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+                batch = self._take()
+                self._linger = len(batch) > 1
+            self._execute(batch)
+
+    def _take(self):
+        """Oldest requests up to max_batch_rows rows (always at least one)"""
+        rows = 0
+        count = 0
+        for request in self._pending:
+            if count and rows + len(request.X) > self.max_batch_rows:
+                break
+            rows += len(request.X)
+            count += 1
+        batch = self._pending[:count]
+        del self._pending[:count]
+        self._pending_rows -= rows
+        return batch
+
+    def _execute(self, batch):
+        waited = time.perf_counter() - batch[0].queued_at
+        # A hot model reload can leave requests for two models in one batch
+        by_bundle = {}
+        for request in batch:
+            by_bundle.setdefault(id(request.bundle), []).append(request)
+        for requests in by_bundle.values():
+            try:
+                results = self._call(requests[0].bundle, [r.X for r in requests])
+                for request, result in zip(requests, results):
+                    request.result = result
+            except Exception as e:
+                for request in requests:
+                    request.error = e
+            for request in requests:
+                request.done.set()
+        if self.on_batch:
+            self.on_batch(len(batch), sum(len(r.X) for r in batch), waited)
+
+    def _call(self, bundle, matrices):
+        """One model call on the stacked matrices, split back per matrix"""
+        if len(matrices) == 1:
+            return [bundle.predict_matrix(matrices[0])]
+        probability = bundle.predict_matrix(np.vstack(matrices))
+        return np.split(probability, np.cumsum([len(X) for X in matrices])[:-1])
@@ -0,0 +1,82 @@
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from batching import MAX_BATCH_ROWS, MAX_WAIT, MicroBatcher
+from inference import build_race_features, load_bundle, load_history
+
+MODEL_FILES = ["backend/data/scaler.pkl", "backend/data/random_forest_model.pkl", "backend/data/feature_columns.pkl"]
+EXPORT_DIR = "backend/data/random_forest_model"
+
+
+def run_clients(batcher, bundle, features, clients, requests_per_client):
+    """Every client sends its requests back to back; returns (seconds, per-request latencies)"""
+    latencies = [[] for _ in range(clients)]
+    barrier = threading.Barrier(clients + 1)
+
+    def client(i):
+        barrier.wait()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            batcher.predict_proba(bundle, features)
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate(latencies)
+
+
+def check_same_values(bundle, features):
+    """Batched results must be exactly what one request alone gets"""
+    batcher = MicroBatcher(max_wait=0.05)
+    expected = bundle.predict_proba(features)
+    results = [None] * 8
+
+    def client(i):
+        results[i] = batcher.predict_proba(bundle, features.iloc[i:])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, expected[i:])
+    print(f"✓ {len(results)} concurrent requests got the same probabilities as unbatched calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of /api/predict's model call with and without batching")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--max-rows", type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument("--wait-ms", type=float, default=MAX_WAIT * 1000)
+    args = parser.parse_args()
+
+    bundle = load_bundle(*MODEL_FILES, export_dir=EXPORT_DIR)
+    history = load_history()
+    last = history.iloc[-1]
+    features = build_race_features(history, int(last['Season']), int(last['Round']))
+
+    print("\n" + "="*70)
+    print(f"MICRO-BATCHING ({type(bundle).__name__}, {len(features)} rows per request)")
+    print("="*70)
+    check_same_values(bundle, features)
+
+    for clients in args.clients:
+        print(f"\n{clients} concurrent client(s), {args.requests} requests each:")
+        for label, max_rows in (("direct", 0), (f"batched ({args.wait_ms:g} ms)", args.max_rows)):
+            occupancy = []
+            batcher = MicroBatcher(max_rows, args.wait_ms / 1000, on_batch=lambda n, rows, waited: occupancy.append(n))
+            seconds, latencies = run_clients(batcher, bundle, features, clients, args.requests)
+            print(f"  {label:18s} {len(latencies) / seconds:8.0f} req/s"
+                  f"   p50 {np.percentile(latencies, 50) * 1000:6.2f} ms"
+                  f"   p99 {np.percentile(latencies, 99) * 1000:6.2f} ms"
+                  f"   {np.mean(occupancy):5.1f} requests per model call")
@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import calculate_driver_form, calculate_dnf_rate, calculate_podium_rate
+from history_index import HistoryIndex
+from storage import read_stage
+
+# ============================================================
+# Previous per-driver loop implementations, kept as the reference
+# the grouped versions in features.py must agree with
+# ============================================================
+
+def loop_driver_form(df, races_back=5):
+    driver_form = {}
+    for driver in df['FullName'].unique():
+        driver_races = df[df['FullName'] == driver].sort_values(['Season', 'Round'])
+        positions = driver_races['Position'].dropna().values
+        driver_form[driver] = positions[-races_back:].mean() if len(positions) > 0 else np.nan
+    return driver_form
+
+def loop_dnf_rate(df):
+    dnf_rates = {}
+    for driver in df['FullName'].unique():
+        driver_races = df[df['FullName'] == driver]
+        total_races = len(driver_races)
+        dnf_count = len(driver_races[driver_races['Status'] != 'Finished'])
+        dnf_rates[driver] = (dnf_count / total_races * 100) if total_races > 0 else 0
+    return dnf_rates
+
+def loop_podium_rate(df):
+    podium_rates = {}
+    for driver in df['FullName'].unique():
+        driver_races = df[df['FullName'] == driver]
+        total_races = len(driver_races)
+        podium_count = len(driver_races[driver_races['Position'] <= 3])
+        podium_rates[driver] = (podium_count / total_races * 100) if total_races > 0 else 0
+    return podium_rates
+
+PAIRS = [
+    ('driver_recent_form', loop_driver_form, calculate_driver_form),
+    ('driver_dnf_rate', loop_dnf_rate, calculate_dnf_rate),
+    ('driver_podium_rate', loop_podium_rate, calculate_podium_rate),
+]
+
+def scale_up(df, factor, drivers_per_copy=10):
+    """
+    Stack `factor` copies of the data as later seasons. Every block of
+    `drivers_per_copy` copies gets its own driver names so the number of
+    drivers grows with the data, like a longer history would.
+    """
+    n_seasons = df['Season'].max() - df['Season'].min() + 1
+    copies = []
+    for k in range(factor):
+        copy = df.copy()
+        copy['Season'] = copy['Season'] + k * n_seasons
+        copy['FullName'] = copy['FullName'] + f" #{k // drivers_per_copy}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+def check_same_values(df):
+    """Mapped feature columns from the loop and grouped versions must match"""
+    for name, loop_fn, grouped_fn in PAIRS:
+        expected = df['FullName'].map(loop_fn(df))
+        actual = df['FullName'].map(grouped_fn(df))
+        pd.testing.assert_series_equal(actual, expected, check_names=False, rtol=1e-12)
+        print(f"✓ {name}: grouped values match the loop version")
+
+def time_it(fn, df, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    df = read_stage('combined')
+    df = df.sort_values(['Season', 'Round']).reset_index(drop=True)
+
+    print("\n" + "="*70)
+    print("FEATURE REGRESSION CHECK")
+    print("="*70)
+    check_same_values(df)
+
+    print("\n" + "="*70)
+    print("FEATURE TIMING (loop vs grouped)")
+    print("="*70)
+    for factor in (1, 100):
+        scaled = df if factor == 1 else scale_up(df, factor)
+        print(f"\n{factor}x data: {len(scaled)} rows, {scaled['FullName'].nunique()} drivers")
+        if factor > 1:
+            check_same_values(scaled)
+        # The grouped versions share one index per frame, built on first use. A
+        # single feature computed on a new frame pays for the build, so the
+        # speedup is quoted against the grouped time plus the build.
+        index_time = time_it(HistoryIndex, scaled)
+        print(f"  {'history index build':20s} {index_time * 1000:9.1f} ms (once per frame)")
+        for name, loop_fn, grouped_fn in PAIRS:
+            loop_time = time_it(loop_fn, scaled, repeat=1 if factor > 1 else 3)
+            grouped_time = time_it(grouped_fn, scaled)
+            total_time = grouped_time + index_time
+            print(f"  {name:20s} loop: {loop_time * 1000:9.1f} ms   grouped: {grouped_time * 1000:7.1f} ms"
+                  f"   with index build: {total_time * 1000:7.1f} ms   ({loop_time / total_time:.0f}x)")
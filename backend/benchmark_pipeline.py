@@ -0,0 +1,253 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from benchmark_features import scale_up
+from clean_data import clean_features
+from combine_data import list_race_files, read_race_files
+from entities import load_entities
+from features import add_features
+from inference import load_bundle, predict_race
+from storage import DATA_DIR, read_stage
+from synthetic_data import synthetic_history
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(DATA_DIR, "benchmarks")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+MODEL_FILES = [os.path.join(DATA_DIR, name) for name in ("scaler.pkl", "random_forest_model.pkl", "feature_columns.pkl")]
+EXPORT_DIR = os.path.join(DATA_DIR, "random_forest_model")
+
+# A stage is flagged when it gets this much slower / bigger than the baseline
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+# ...and only if it lost at least this many seconds (millisecond stages are noisy)
+MIN_TIME_DELTA = 0.005
+
+# ============================================================
+# Inputs per scale, built once and not timed
+# ============================================================
+
+def prepare(scale, synthetic=False):
+    """
+    Every stage's input at `scale` times the current data: the real
+    history stacked `scale` times, or a synthetic one with 6 x `scale`
+    seasons (synthetic_data.py), which has realistic driver churn.
+    """
+    with open(MODEL_FILES[2], "rb") as f:
+        feature_columns = pickle.load(f)
+    if synthetic:
+        combined = synthetic_history(seasons=6 * scale, rounds=20, seed=42)
+    else:
+        combined = read_stage('combined').sort_values(['Season', 'Round'], kind='stable').reset_index(drop=True)
+        if scale > 1:
+            combined = scale_up(combined, scale)
+    # As features.py reads it; synthetic or scaled-up names are added in memory only
+    combined = load_entities().categorize(combined)
+    with contextlib.redirect_stdout(io.StringIO()):
+        features = add_features(combined.copy())
+        cleaned = clean_features(features.copy())
+    X = cleaned[feature_columns]
+    last = cleaned.iloc[-1]
+    return {
+        'race_files': sorted(list_race_files()),
+        'scale': scale,
+        'combined': combined,
+        'features': features,
+        'X': X,
+        'X_scaled': pd.DataFrame(StandardScaler().fit_transform(X), columns=feature_columns),
+        'y': cleaned['is_winner'],
+        'history': cleaned,
+        'race': (int(last['Season']), int(last['Round'])),
+        'bundle': load_bundle(*MODEL_FILES, export_dir=EXPORT_DIR),
+    }
+
+# ============================================================
+# Stages
+# Each takes the prepared inputs and does one stage's work
+# ============================================================
+
+def bench_combine(data):
+    # The race files are parsed `scale` times over, standing in for a longer history
+    frames = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(data['scale']):
+            frames.extend(read_race_files(data['race_files']).values())
+    return pd.concat(frames, ignore_index=True)
+
+def bench_features(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return add_features(data['combined'].copy())
+
+def bench_clean(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return clean_features(data['features'].copy())
+
+def bench_scale(data):
+    return StandardScaler().fit_transform(data['X'])
+
+def bench_train_rf(data):
+    # Same settings as model.py
+    model = RandomForestClassifier(n_estimators=100, max_depth=15, min_samples_split=10, min_samples_leaf=4,
+                                   random_state=42, class_weight='balanced', n_jobs=-1)
+    return model.fit(data['X_scaled'], data['y'])
+
+def bench_train_lr(data):
+    # Same settings as model_baseline.py
+    return LogisticRegression(random_state=42, max_iter=1000, class_weight='balanced').fit(data['X_scaled'], data['y'])
+
+def bench_inference(data):
+    season, rnd = data['race']
+    return predict_race(data['bundle'], data['history'], season, rnd)
+
+def setup_api(data):
+    """Import the app and serve this scale's history, outside the timed runs"""
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as flask_app
+    if data.get('api_history') is not data['history']:
+        # The (missing) placeholder path gives each scale its own
+        # signature, so refresh() swaps this history in
+        placeholder = f"<benchmark history {data['scale']}x>"
+        flask_app.artifacts.register("history", [placeholder], lambda paths: data['history'])
+        flask_app.artifacts.refresh()
+        data['api_history'] = data['history']
+        data['client'] = flask_app.app.test_client()
+    # Warm-up request: builds the history index, as app startup does
+    bench_api(data)
+
+def bench_api(data):
+    season, rnd = data['race']
+    response = data['client'].get(f"/api/predict?season={season}&round={rnd}")
+    assert response.status_code == 200, response.status_code
+    return response
+
+BENCHMARKS = {
+    'combine': bench_combine,
+    'features': bench_features,
+    'clean': bench_clean,
+    'scale': bench_scale,
+    'train_rf': bench_train_rf,
+    'train_lr': bench_train_lr,
+    'inference': bench_inference,
+    'api': bench_api,
+}
+
+# Untimed per-stage setup, run once per scale before the stage is measured
+SETUP = {
+    'api': setup_api,
+}
+
+# ============================================================
+# Measuring
+# ============================================================
+
+def measure(fn, data, repeat):
+    """Best wall time over `repeat` runs, then peak traced memory of one more run"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': best, 'peak_mb': peak / 2**20}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'cpus': os.cpu_count(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline):
+    """Stage/scale pairs that got slower or bigger than the baseline allows"""
+    regressions = []
+    for key, now in results['stages'].items():
+        before = baseline['stages'].get(key)
+        if before is None:
+            continue
+        time_ratio = now['seconds'] / before['seconds']
+        memory_ratio = now['peak_mb'] / before['peak_mb'] if before['peak_mb'] > 0 else 1.0
+        slower = time_ratio > TIME_TOLERANCE and now['seconds'] - before['seconds'] > MIN_TIME_DELTA
+        flagged = slower or memory_ratio > MEMORY_TOLERANCE
+        print(f"  {'✗' if flagged else '✓'} {key:18s} time {time_ratio:5.2f}x   memory {memory_ratio:5.2f}x")
+        if flagged:
+            regressions.append(key)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage at several data sizes")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--stages", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage at 1x (larger scales run once)")
+    parser.add_argument("--synthetic", action="store_true", help="use generated histories instead of stacked copies")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("PIPELINE BENCHMARKS")
+    print("="*70)
+
+    results = {'environment': environment(), 'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+               'synthetic': args.synthetic, 'stages': {}}
+    for scale in args.scales:
+        data = prepare(scale, args.synthetic)
+        print(f"\n{scale}x data: {len(data['combined'])} rows, {len(data['race_files']) * scale} race files")
+        for name in args.stages:
+            if name in SETUP:
+                SETUP[name](data)
+            result = measure(BENCHMARKS[name], data, args.repeat if scale == 1 else 1)
+            results['stages'][f"{name}@{scale}x"] = result
+            print(f"  {name:10s} {result['seconds'] * 1000:10.1f} ms   peak {result['peak_mb']:8.1f} MB")
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"\n✓ Saved results to {RESULTS_FILE}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"✓ Saved as baseline: {BASELINE_FILE}")
+        sys.exit(0)
+
+    if not os.path.exists(BASELINE_FILE):
+        print("No baseline yet: rerun with --save-baseline to store one")
+        sys.exit(0)
+
+    with open(BASELINE_FILE) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with baseline from {baseline['created']}:")
+    if baseline['environment'] != results['environment']:
+        print("  (baseline was recorded in a different environment)")
+    if baseline.get('synthetic', False) != args.synthetic:
+        print("  (baseline used the other data source; compare runs with the same --synthetic setting)")
+    regressions = compare(results, baseline)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✓ No regressions")
@@ -0,0 +1,73 @@
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from forest_artifact import load_forest
+from storage import read_split, read_stage
+
+BATCH_SIZES = (1, 20, 10_000)
+
+
+def load_models():
+    with open("backend/data/random_forest_model.pkl", "rb") as f:
+        rf_model = pickle.load(f)
+    with open("backend/data/scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    with open("backend/data/feature_columns.pkl", "rb") as f:
+        feature_columns = pickle.load(f)
+    return rf_model, scaler, feature_columns, load_forest()
+
+
+def sklearn_predict(rf_model, scaler, feature_columns, X_raw):
+    """What ModelBundle does: scale, then sklearn predict_proba"""
+    scaled = pd.DataFrame(scaler.transform(pd.DataFrame(X_raw, columns=feature_columns)), columns=feature_columns)
+    return rf_model.predict_proba(scaled)[:, 1]
+
+
+def sample_rows(X_raw, n, seed=0):
+    return X_raw[np.random.default_rng(seed).integers(0, len(X_raw), n)]
+
+
+def check_same_values(rf_model, scaler, feature_columns, forest, X_raw):
+    """The NumPy predictor must give sklearn's probabilities on historical and random rows"""
+    noise = np.random.default_rng(1).normal(size=(5000, len(feature_columns)))
+    for name, rows in (("historical rows", X_raw), ("random rows", scaler.inverse_transform(noise))):
+        expected = sklearn_predict(rf_model, scaler, feature_columns, rows)
+        actual = forest.predict_proba(rows)
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+        print(f"✓ {name}: {len(rows)} probabilities match sklearn (max diff {np.abs(actual - expected).max():.1e})")
+
+
+def time_it(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+if __name__ == "__main__":
+    rf_model, scaler, feature_columns, forest = load_models()
+    # Raw feature rows from the cleaned history (train/test splits are already scaled)
+    X_raw = read_stage('cleaned')[feature_columns].to_numpy(dtype=np.float64)
+    X_test, _ = read_split('test')
+
+    print("\n" + "="*70)
+    print("PREDICTOR REGRESSION CHECK")
+    print("="*70)
+    check_same_values(rf_model, scaler, feature_columns, forest, X_raw)
+    check_same_values(rf_model, scaler, feature_columns, forest, scaler.inverse_transform(X_test))
+
+    print("\n" + "="*70)
+    print(f"PREDICTOR TIMING ({forest.n_trees} trees, depth {forest.max_depth}, sklearn n_jobs={rf_model.n_jobs})")
+    print("="*70)
+    for n in BATCH_SIZES:
+        rows = sample_rows(X_raw, n)
+        repeat = 200 if n <= 20 else 10
+        sklearn_time = time_it(lambda: sklearn_predict(rf_model, scaler, feature_columns, rows), repeat)
+        numpy_time = time_it(lambda: forest.predict_proba(rows), repeat)
+        print(f"  batch {n:6d}   sklearn: {sklearn_time * 1000:8.2f} ms   numpy: {numpy_time * 1000:8.2f} ms"
+              f"   ({sklearn_time / numpy_time:.1f}x)")
@@ -1,40 +1,151 @@
 import pandas as pd
+import argparse
+import hashlib
+import json
 import os
-import glob
-
-# Read all CSV files from the data folder
-data_dir = "data"
-all_files = glob.glob(os.path.join(data_dir, "f1_*.csv"))
-
-print(f"Found {len(all_files)} race files")
-print("Combining all races into one dataset...\n")
-
-# Combine all files into one dataframe
-dfs = []
-for file in sorted(all_files):
-    try:
-        df = pd.read_csv(file)
-        dfs.append(df)
-        print(f"✓ Loaded: {os.path.basename(file)}")
-    except Exception as e:
-        print(f"✗ Error reading {os.path.basename(file)}: {e}")
-
-if len(dfs) > 0:
-    combined_df = pd.concat(dfs, ignore_index=True)
-    
-    # Save the combined file
-    output_file = f"{data_dir}/f1_all_races_combined.csv"
-    combined_df.to_csv(output_file, index=False)
-    
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from entities import update_entities
+from instrument import span
+from storage import DATA_DIR, dataset_path, has_dataset, read_dataset, read_stage, write_dataset
+
+# Only per-race downloads, e.g. f1_2024_race_07.csv (not the combined/cleaned outputs)
+RACE_FILE_PATTERN = re.compile(r"^f1_(\d{4})_race_(\d{2})\.csv$")
+MANIFEST_FILE = os.path.join(DATA_DIR, "ingest_manifest.json")
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def list_race_files(data_dir=DATA_DIR):
+    """{filename: (season, round)} for every per-race CSV in the data folder"""
+    files = {}
+    for name in os.listdir(data_dir):
+        match = RACE_FILE_PATTERN.match(name)
+        if match:
+            files[name] = (int(match.group(1)), int(match.group(2)))
+    return files
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    tmp_file = MANIFEST_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def plan_ingest(race_files, manifest, data_dir=DATA_DIR):
+    """
+    Compare the folder with the manifest.
+    Returns (changed filenames, removed filenames, manifest entries for all current files).
+    Files whose size and mtime match the manifest are not even hashed.
+    """
+    changed, entries = [], {}
+    for name, (season, rnd) in sorted(race_files.items()):
+        st = os.stat(os.path.join(data_dir, name))
+        old = manifest.get(name)
+        if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+            entries[name] = old
+            continue
+        digest = file_hash(os.path.join(data_dir, name))
+        entries[name] = {'season': season, 'round': rnd, 'size': st.st_size,
+                         'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        if not old or old['sha256'] != digest:
+            changed.append(name)
+    removed = sorted(set(manifest) - set(race_files))
+    return changed, removed, entries
+
+
+def read_race_files(names, data_dir=DATA_DIR, workers=8):
+    """Parse race CSVs in parallel; returns {filename: DataFrame}"""
+    def read_one(name):
+        return name, pd.read_csv(os.path.join(data_dir, name))
+
+    frames = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name, df in pool.map(read_one, names):
+            frames[name] = df
+            print(f"✓ Loaded: {name}")
+    return frames
+
+
+def ingest(full=False, workers=8):
+    """Bring the combined store up to date with the race files; returns number of files added, changed or dropped"""
+    race_files = list_race_files()
+    manifest = {} if full or not has_dataset('combined') else load_manifest()
+
+    changed, removed, entries = plan_ingest(race_files, manifest)
+    print(f"Found {len(race_files)} race files: {len(changed)} new/changed, {len(removed)} removed")
+
+    if not changed and not removed:
+        save_manifest(entries)
+        return 0
+
+    with span("parse race files", files=len(changed)):
+        frames = read_race_files(changed, workers=workers)
+
+    # Only the seasons touched by this run are rewritten
+    replaced = {race_files[name] for name in changed}
+    replaced |= {(manifest[name]['season'], manifest[name]['round']) for name in removed}
+    seasons = sorted({season for season, _ in replaced})
+
+    if manifest:
+        existing = read_dataset('combined', seasons=seasons)
+        keep = ~pd.Series(list(zip(existing['Season'], existing['Round'])), index=existing.index).isin(replaced)
+        existing = existing[keep]
+    else:
+        existing = None
+
+    new_rows = pd.concat([existing] + list(frames.values()) if existing is not None else list(frames.values()),
+                         ignore_index=True)
+    new_rows = new_rows.sort_values(['Season', 'Round'], kind='stable').reset_index(drop=True)
+
+    with span("write combined", rows=len(new_rows), seasons=len(seasons)):
+        write_dataset(new_rows, 'combined', seasons_only=bool(manifest))
+    for season in set(seasons) - set(new_rows['Season']):
+        shutil.rmtree(os.path.join(dataset_path('combined'), f"Season={season}"), ignore_errors=True)
+    save_manifest(entries)
+    print(f"✓ Rewrote seasons: {', '.join(str(s) for s in seasons)}")
+    return len(changed) + len(removed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine per-race CSVs into the combined dataset")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and rebuild everything")
+    parser.add_argument("--workers", type=int, default=8, help="parallel CSV parsers")
+    args = parser.parse_args()
+
+    print("Combining all races into one dataset...\n")
+    updated = ingest(full=args.full, workers=args.workers)
+
+    if updated == 0 and has_dataset('combined'):
+        print("\n✓ Combined dataset already up to date - nothing to do")
+
+    combined_df = read_stage('combined', columns=['Season', 'Round', 'FullName', 'TeamName', 'Status'])
+    entities, new_names = update_entities(combined_df)
+
     print(f"\n{'='*60}")
     print(f"✓ Combined all races: {len(combined_df)} total race results")
-    print(f"✓ Saved to: {output_file}")
-    
+    print(f"✓ Saved to: {os.path.join(DATA_DIR, 'store', 'combined')}")
+
     # Show some statistics
     print(f"\nDataset Summary:")
     print(f"  Seasons: {int(combined_df['Season'].min())} to {int(combined_df['Season'].max())}")
     print(f"  Total races: {combined_df.groupby(['Season', 'Round']).ngroups}")
     print(f"  Unique drivers: {combined_df['FullName'].nunique()}")
     print(f"  Unique teams: {combined_df['TeamName'].nunique()}")
-else:
-    print("✗ No files to combine!")
+    print(f"\n✓ Entity dictionary: {new_names} new names ("
+          + ", ".join(f"{kind}: {len(names)}" for kind, names in entities.names.items()) + ")")
@@ -0,0 +1,95 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from f1_schedule import F1_SCHEDULE
+from storage import DATA_DIR
+
+ENTITIES_FILE = os.path.join(DATA_DIR, "entities.json")
+
+# Entity kind -> the column holding its names
+COLUMNS = {
+    'driver': 'FullName',
+    'team': 'TeamName',
+    'status': 'Status',
+    'circuit': 'EventName',
+}
+
+
+class EntityDictionary:
+    """
+    Stable integer IDs for drivers, teams, statuses and circuits.
+
+    IDs are positions in an append-only name list per kind, so a name
+    keeps its ID across runs and new names get the next free one.
+    categorize() turns name columns into pandas categoricals whose codes
+    are these IDs: every frame shares the same categories, so groupbys,
+    merges and comparisons on them run on int8/int16 codes.
+    """
+
+    def __init__(self, names=None):
+        self.names = {kind: list((names or {}).get(kind, [])) for kind in COLUMNS}
+        self._categories = {}
+
+    @classmethod
+    def load(cls, path=ENTITIES_FILE):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path=ENTITIES_FILE):
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.names, f, indent=1)
+        os.replace(tmp_file, path)
+
+    def add(self, kind, values):
+        """Give unseen names the next IDs, in order of first appearance; returns how many were new"""
+        known = set(self.names[kind])
+        new = [name for name in pd.unique(pd.Series(values).dropna().astype(str)) if name not in known]
+        if new:
+            self.names[kind].extend(new)
+            self._categories.pop(kind, None)
+        return len(new)
+
+    def update(self, df):
+        """Add the names of every entity column present in df; returns how many were new"""
+        return sum(self.add(kind, df[column]) for kind, column in COLUMNS.items() if column in df.columns)
+
+    def categories(self, kind):
+        if kind not in self._categories:
+            self._categories[kind] = pd.CategoricalDtype(self.names[kind])
+        return self._categories[kind]
+
+    def codes(self, kind, values):
+        """Integer IDs for names; -1 for names not in the dictionary (or missing)"""
+        return pd.Categorical(values, dtype=self.categories(kind)).codes.astype(np.int16)
+
+    def categorize(self, df):
+        """
+        df with its entity columns as categoricals on the shared categories.
+        Names missing from the dictionary are added first (in memory only),
+        so no value is lost.
+        """
+        df = df.copy()
+        for kind, column in COLUMNS.items():
+            if column in df.columns:
+                self.add(kind, df[column])
+                df[column] = df[column].astype(self.categories(kind))
+        return df
+
+
+def load_entities(path=ENTITIES_FILE):
+    return EntityDictionary.load(path)
+
+
+def update_entities(df, path=ENTITIES_FILE):
+    """Add df's new names (and the schedule's circuits) to the stored dictionary"""
+    entities = load_entities(path)
+    new = entities.update(df)
+    new += entities.add('circuit', [name for _, _, name in F1_SCHEDULE])
+    entities.save(path)
+    return entities, new
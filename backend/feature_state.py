@@ -0,0 +1,137 @@
+import argparse
+import os
+import pickle
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from features import NEW_FEATURES, NO_FORM
+from storage import read_stage
+
+STATE_FILE = "backend/data/feature_state.pkl"
+
+
+class FeatureState:
+    """
+    Running per-driver and per-team totals, enough to produce the as-of
+    features (same values as features.add_asof_features) for the next race
+    without looking at the history again.
+
+    append_race() costs O(field size): it emits the new rows' features from
+    the current totals, then folds the race into the totals.
+    """
+
+    def __init__(self, races_back=5):
+        self.races_back = races_back
+        self.drivers = {}   # name -> {'starts', 'wins', 'podiums', 'dnfs', 'recent'}
+        self.teams = {}     # name -> {'starts', 'wins'}
+        self.last_race = None
+
+    def _driver(self, name):
+        if name not in self.drivers:
+            self.drivers[name] = {'starts': 0, 'wins': 0, 'podiums': 0, 'dnfs': 0,
+                                  'recent': deque(maxlen=self.races_back)}
+        return self.drivers[name]
+
+    def _team(self, name):
+        if name not in self.teams:
+            self.teams[name] = {'starts': 0, 'wins': 0}
+        return self.teams[name]
+
+    def features_for(self, driver, team):
+        """As-of feature values for one driver/team from the current totals"""
+        d = self.drivers.get(driver)
+        t = self.teams.get(team)
+        starts = d['starts'] if d else 0
+        team_starts = t['starts'] if t else 0
+        return {
+            'driver_recent_form': float(np.mean(d['recent'])) if d and d['recent'] else NO_FORM,
+            'driver_win_percentage': d['wins'] / starts * 100 if starts else 0.0,
+            'team_win_percentage': t['wins'] / team_starts * 100 if team_starts else 0.0,
+            'driver_dnf_rate': d['dnfs'] / starts * 100 if starts else 0.0,
+            'driver_podium_rate': d['podiums'] / starts * 100 if starts else 0.0,
+            'driver_races_competed': starts,
+        }
+
+    def append_race(self, df_race):
+        """Return df_race with as-of feature columns added, then update the totals"""
+        season, rnd = int(df_race['Season'].iloc[0]), int(df_race['Round'].iloc[0])
+        if ((df_race['Season'] != season) | (df_race['Round'] != rnd)).any():
+            raise ValueError("append_race expects the rows of a single race")
+        if self.last_race is not None and (season, rnd) <= self.last_race:
+            raise ValueError(f"race {season} round {rnd} is not after {self.last_race[0]} round {self.last_race[1]}")
+
+        rows = df_race.reset_index(drop=True).copy()
+        values = [self.features_for(d, t) for d, t in zip(rows['FullName'], rows['TeamName'])]
+        for col, series in pd.DataFrame(values).items():
+            rows[col] = series
+        rows['starting_position_quality'] = rows['GridPosition'].fillna(20)
+        rows['driver_races_competed'] = rows['driver_races_competed'].astype(int)
+
+        position = rows['Position']
+        finishes = {}
+        for driver, team, pos, status in zip(rows['FullName'], rows['TeamName'], position, rows['Status']):
+            won = int(pos == 1.0)
+            d = self._driver(driver)
+            d['starts'] += 1
+            d['wins'] += won
+            d['podiums'] += int(pos <= 3)
+            d['dnfs'] += int(status != 'Finished')
+            if not pd.isna(pos):
+                finishes.setdefault(driver, []).append(pos)
+            if not pd.isna(team):
+                tm = self._team(team)
+                tm['starts'] += 1
+                tm['wins'] += won
+        # One entry per race in the recent-form window, like the as-of pass
+        for driver, positions in finishes.items():
+            self.drivers[driver]['recent'].append(float(np.mean(positions)))
+
+        self.last_race = (season, rnd)
+        return rows[list(df_race.columns) + NEW_FEATURES]
+
+    @classmethod
+    def from_history(cls, df, races_back=5):
+        """Build the state by replaying every race in chronological order"""
+        state = cls(races_back)
+        for _, df_race in df.sort_values(['Season', 'Round'], kind='stable').groupby(['Season', 'Round'], sort=True):
+            state.append_race(df_race)
+        return state
+
+    def save(self, path=STATE_FILE):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append one race to the incremental feature state")
+    parser.add_argument("race_file", help="per-race CSV, e.g. backend/data/f1_2025_race_21.csv")
+    parser.add_argument("--history", help="CSV of results used to build the state when it does not exist yet "
+                                          "(default: the combined stage)")
+    parser.add_argument("--output", help="CSV to append the new feature rows to")
+    args = parser.parse_args()
+
+    if os.path.exists(STATE_FILE):
+        state = FeatureState.load()
+        print(f"✓ Loaded feature state up to {state.last_race}")
+    else:
+        print("Building feature state from history (one-time)...")
+        history = pd.read_csv(args.history) if args.history else read_stage('combined')
+        state = FeatureState.from_history(history)
+        print(f"✓ Built feature state up to {state.last_race}")
+
+    new_rows = state.append_race(pd.read_csv(args.race_file))
+    state.save()
+    print(f"✓ Appended {args.race_file} ({len(new_rows)} rows), state saved to {STATE_FILE}")
+
+    if args.output:
+        new_rows.to_csv(args.output, mode="a", index=False, header=not os.path.exists(args.output))
+        print(f"✓ Appended feature rows to {args.output}")
+
+    print(new_rows[['FullName', 'TeamName'] + NEW_FEATURES].to_string(index=False))
@@ -1,174 +1,282 @@
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from entities import load_entities
+from history_index import history_index
+from instrument import span
+from storage import read_stage, write_dataset
 
-# Load combined data
-df = pd.read_csv("backend/data/f1_all_races_combined.csv")
-
-print("\n" + "="*70)
-print("FEATURE")
-print("="*70)
-
-# Make a copy to work with
-df_features = df.copy()
-
-# Sort by season and round to maintain chronological order
-df_features = df_features.sort_values(['Season', 'Round']).reset_index(drop=True)
-
-print("\nOriginal columns:", list(df_features.columns))
+NEW_FEATURES = [
+    'driver_recent_form',
+    'driver_win_percentage',
+    'team_win_percentage',
+    'starting_position_quality',
+    'driver_dnf_rate',
+    'driver_podium_rate',
+    'driver_races_competed'
+]
 
 # ============================================================
-# FEATURE 1: Driver Recent Form (Last 5 races)
+# Per-driver / per-team aggregations
+# Each one reads the frame's HistoryIndex (history_index.py), where a
+# driver's or team's rows are one contiguous block, and returns a
+# Series indexed by name, ready for df['FullName'].map(...)
 # ============================================================
-print("\n[1/7] Creating Driver Recent Form feature...")
 
 def calculate_driver_form(df, races_back=5):
     """Calculate average finishing position for last N races"""
-    driver_form = {}
-    
-    for driver in df['FullName'].unique():
-        driver_races = df[df['FullName'] == driver].sort_values(['Season', 'Round'])
-        
-        # Get positions from all races
-        positions = driver_races['Position'].dropna().values
-        
-        if len(positions) > 0:
-            # Average of last 5 races (or fewer if driver hasn't done 5 races yet)
-            recent_avg = positions[-races_back:].mean()
-            driver_form[driver] = recent_avg
-        else:
-            driver_form[driver] = np.nan
-    
-    return driver_form
-
-driver_form = calculate_driver_form(df_features)
-df_features['driver_recent_form'] = df_features['FullName'].map(driver_form)
+    # Average of last 5 races (or fewer if driver hasn't done 5 races yet)
+    index = history_index(df)
+    return index.by_driver_name(index.driver_recent_form(races_back)).dropna()
 
-print("✓ Added: driver_recent_form")
-
-# ============================================================
-# FEATURE 2: Driver Win Percentage
-# ============================================================
-print("\n[2/7] Creating Driver Win Percentage feature...")
+def calculate_win_rate(df):
+    index = history_index(df)
+    return index.by_driver_name(index.driver_rate('win'))
 
-driver_wins = df_features[df_features['Position'] == 1.0]['FullName'].value_counts()
-driver_total_races = df_features['FullName'].value_counts()
-driver_win_pct = (driver_wins / driver_total_races * 100).fillna(0)
+def calculate_team_win_rate(df):
+    index = history_index(df)
+    return index.by_team_name(index.team_win_rate())
 
-df_features['driver_win_percentage'] = df_features['FullName'].map(driver_win_pct).fillna(0)
+def calculate_dnf_rate(df):
+    index = history_index(df)
+    return index.by_driver_name(index.driver_rate('dnf'))
 
-print("✓ Added: driver_win_percentage")
+def calculate_podium_rate(df):
+    index = history_index(df)
+    return index.by_driver_name(index.driver_rate('podium'))
 
-# ============================================================
-# FEATURE 3: Team Performance (Win Rate)
-# ============================================================
-print("\n[3/7] Creating Team Performance feature...")
+def calculate_races_competed(df):
+    index = history_index(df)
+    return index.by_driver_name(index.driver_totals('rows').astype(np.int64))
 
-team_wins = df_features[df_features['Position'] == 1.0]['TeamName'].value_counts()
-team_total_races = df_features['TeamName'].value_counts()
-team_win_pct = (team_wins / team_total_races * 100).fillna(0)
+def add_features(df_features):
+    """Add the 7 engineered feature columns to a chronologically sorted frame"""
 
-df_features['team_win_percentage'] = df_features['TeamName'].map(team_win_pct).fillna(0)
+    # ============================================================
+    # FEATURE 1: Driver Recent Form (Last 5 races)
+    # ============================================================
+    with span("feature 1/7: driver_recent_form", rows=len(df_features)):
+        print("\n[1/7] Creating Driver Recent Form feature...")
 
-print("✓ Added: team_win_percentage")
+        driver_form = calculate_driver_form(df_features)
+        df_features['driver_recent_form'] = df_features['FullName'].map(driver_form)
 
-# ============================================================
-# FEATURE 4: Qualifying to Race Performance (Grid position helps)
-# ============================================================
-print("\n[4/7] Creating Grid Position Impact feature...")
+        print("✓ Added: driver_recent_form")
 
-# If driver qualified well, they're more likely to win
-df_features['starting_position_quality'] = df_features['GridPosition'].fillna(20)
+    # ============================================================
+    # FEATURE 2: Driver Win Percentage
+    # ============================================================
+    with span("feature 2/7: driver_win_percentage", rows=len(df_features)):
+        print("\n[2/7] Creating Driver Win Percentage feature...")
 
-print("✓ Added: starting_position_quality")
+        driver_win_pct = calculate_win_rate(df_features)
+        df_features['driver_win_percentage'] = df_features['FullName'].map(driver_win_pct).fillna(0)
 
-# ============================================================
-# FEATURE 5: DNF (Did Not Finish) Rate
-# ============================================================
-print("\n[5/7] Creating DNF Rate feature...")
+        print("✓ Added: driver_win_percentage")
 
-def calculate_dnf_rate(df):
-    dnf_rates = {}
-    for driver in df['FullName'].unique():
-        driver_races = df[df['FullName'] == driver]
-        total_races = len(driver_races)
-        dnf_count = len(driver_races[driver_races['Status'] != 'Finished'])
-        dnf_rate = (dnf_count / total_races * 100) if total_races > 0 else 0
-        dnf_rates[driver] = dnf_rate
-    return dnf_rates
+    # ============================================================
+    # FEATURE 3: Team Performance (Win Rate)
+    # ============================================================
+    with span("feature 3/7: team_win_percentage", rows=len(df_features)):
+        print("\n[3/7] Creating Team Performance feature...")
 
-dnf_rates = calculate_dnf_rate(df_features)
-df_features['driver_dnf_rate'] = df_features['FullName'].map(dnf_rates).fillna(0)
+        team_win_pct = calculate_team_win_rate(df_features)
+        df_features['team_win_percentage'] = df_features['TeamName'].map(team_win_pct).fillna(0)
 
-print("✓ Added: driver_dnf_rate")
+        print("✓ Added: team_win_percentage")
 
-# ============================================================
-# FEATURE 6: Podium Rate (Top 3 finishes)
-# ============================================================
-print("\n[6/7] Creating Podium Rate feature...")
+    # ============================================================
+    # FEATURE 4: Qualifying to Race Performance (Grid position helps)
+    # ============================================================
+    with span("feature 4/7: starting_position_quality", rows=len(df_features)):
+        print("\n[4/7] Creating Grid Position Impact feature...")
 
-def calculate_podium_rate(df):
-    podium_rates = {}
-    for driver in df['FullName'].unique():
-        driver_races = df[df['FullName'] == driver]
-        total_races = len(driver_races)
-        podium_count = len(driver_races[driver_races['Position'] <= 3])
-        podium_rate = (podium_count / total_races * 100) if total_races > 0 else 0
-        podium_rates[driver] = podium_rate
-    return podium_rates
+        # If driver qualified well, they're more likely to win
+        df_features['starting_position_quality'] = df_features['GridPosition'].fillna(20)
 
-podium_rates = calculate_podium_rate(df_features)
-df_features['driver_podium_rate'] = df_features['FullName'].map(podium_rates).fillna(0)
+        print("✓ Added: starting_position_quality")
 
-print("✓ Added: driver_podium_rate")
+    # ============================================================
+    # FEATURE 5: DNF (Did Not Finish) Rate
+    # ============================================================
+    with span("feature 5/7: driver_dnf_rate", rows=len(df_features)):
+        print("\n[5/7] Creating DNF Rate feature...")
 
-# ============================================================
-# FEATURE 7: Races Competed (Experience)
-# ============================================================
-print("\n[7/7] Creating Driver Experience feature...")
+        dnf_rates = calculate_dnf_rate(df_features)
+        df_features['driver_dnf_rate'] = df_features['FullName'].map(dnf_rates).fillna(0)
 
-races_competed = df_features['FullName'].value_counts()
-df_features['driver_races_competed'] = df_features['FullName'].map(races_competed).fillna(0)
+        print("✓ Added: driver_dnf_rate")
 
-print("✓ Added: driver_races_competed")
+    # ============================================================
+    # FEATURE 6: Podium Rate (Top 3 finishes)
+    # ============================================================
+    with span("feature 6/7: driver_podium_rate", rows=len(df_features)):
+        print("\n[6/7] Creating Podium Rate feature...")
 
-# ============================================================
-# SUMMARY
-# ============================================================
-print("\n" + "="*70)
-print("NEW FEATURES CREATED")
-print("="*70)
+        podium_rates = calculate_podium_rate(df_features)
+        df_features['driver_podium_rate'] = df_features['FullName'].map(podium_rates).fillna(0)
 
-new_features = [
-    'driver_recent_form',
-    'driver_win_percentage',
-    'team_win_percentage',
-    'starting_position_quality',
-    'driver_dnf_rate',
-    'driver_podium_rate',
-    'driver_races_competed'
-]
+        print("✓ Added: driver_podium_rate")
 
-print("\nNew columns added:")
-for i, feat in enumerate(new_features, 1):
-    print(f"  {i}. {feat}")
+    # ============================================================
+    # FEATURE 7: Races Competed (Experience)
+    # ============================================================
+    with span("feature 7/7: driver_races_competed", rows=len(df_features)):
+        print("\n[7/7] Creating Driver Experience feature...")
 
-print(f"\nTotal columns now: {len(df_features.columns)}")
+        races_competed = calculate_races_competed(df_features)
+        df_features['driver_races_competed'] = df_features['FullName'].map(races_competed).fillna(0)
 
-# Save the engineered features
-output_file = "backend/data/f1_features_engineered.csv"
-df_features.to_csv(output_file, index=False)
-print(f"\n✓ Saved engineered features to: {output_file}")
+        print("✓ Added: driver_races_competed")
 
-# Show sample with new features
-print("\n" + "="*70)
-print("SAMPLE DATA WITH FEATURES")
-print("="*70)
+    return df_features
 
-sample_cols = ['FullName', 'TeamName', 'Position', 'GridPosition', 
-               'driver_recent_form', 'driver_win_percentage', 
-               'team_win_percentage', 'driver_podium_rate']
-print(df_features[sample_cols].head(15))
+# ============================================================
+# As-of (point-in-time) features
+# Every row only sees races strictly before its (Season, Round),
+# so the values are free of leakage and usable for backtests.
+# ============================================================
 
-print("\nFeature statistics:")
-print(df_features[new_features].describe())
+# Same default las_vegas_predict.py / inference.py use for drivers without history
+NO_FORM = 999
+
+def _exclusive_cumsum(race_table, columns, level):
+    """Running totals over earlier races only (cumulative sum minus the current race)"""
+    totals = race_table[columns].groupby(level=level, sort=False, observed=True).cumsum()
+    return totals - race_table[columns]
+
+def add_asof_features(df_features, races_back=5):
+    """
+    Add the same 7 feature columns, computed as of the start of each race.
+
+    One sorted pass: rows are collapsed to one record per driver (and per
+    team) per race, then shifted expanding sums and a rolling window over
+    each driver's races give the value before that race.
+    """
+    df_features = df_features.sort_values(['Season', 'Round'], kind='stable').reset_index(drop=True)
+    position = df_features['Position']
+
+    flags = pd.DataFrame({
+        'FullName': df_features['FullName'],
+        'TeamName': df_features['TeamName'],
+        'Season': df_features['Season'],
+        'Round': df_features['Round'],
+        'Position': position,
+        'starts': 1,
+        'wins': (position == 1.0).astype(int),
+        'podiums': (position <= 3).astype(int),
+        'dnfs': (df_features['Status'] != 'Finished').astype(int),
+    })
+    counts = ['starts', 'wins', 'podiums', 'dnfs']
+
+    print("\n[1/3] Accumulating driver history race by race...")
+
+    # sort=False keeps chronological order inside each driver
+    driver_races = flags.groupby(['FullName', 'Season', 'Round'], sort=False, observed=True).agg(
+        starts=('starts', 'sum'),
+        wins=('wins', 'sum'),
+        podiums=('podiums', 'sum'),
+        dnfs=('dnfs', 'sum'),
+        Position=('Position', 'mean'),
+    )
+    driver_prior = _exclusive_cumsum(driver_races, counts, 'FullName')
+
+    # Rolling mean over finished races, carried forward, then shifted by one race
+    finished = driver_races['Position'].dropna()
+    form_after = (finished.groupby(level='FullName', sort=False, observed=True)
+                  .rolling(races_back, min_periods=1).mean()
+                  .droplevel(0)
+                  .reindex(driver_races.index))
+    form_after = form_after.groupby(level='FullName', sort=False, observed=True).ffill()
+    driver_prior['form'] = form_after.groupby(level='FullName', sort=False, observed=True).shift(1)
+
+    print("\n[2/3] Accumulating team history race by race...")
+
+    team_races = flags.groupby(['TeamName', 'Season', 'Round'], sort=False, observed=True)[['starts', 'wins']].sum()
+    team_prior = _exclusive_cumsum(team_races, ['starts', 'wins'], 'TeamName')
+
+    print("\n[3/3] Joining as-of values back onto every row...")
+
+    driver_rows = df_features[['FullName', 'Season', 'Round']].join(
+        driver_prior, on=['FullName', 'Season', 'Round'])
+    team_rows = df_features[['TeamName', 'Season', 'Round']].join(
+        team_prior, on=['TeamName', 'Season', 'Round'])
+
+    prior_starts = driver_rows['starts'].replace(0, np.nan)
+    team_starts = team_rows['starts'].replace(0, np.nan)
+
+    df_features['driver_recent_form'] = driver_rows['form'].fillna(NO_FORM)
+    df_features['driver_win_percentage'] = (driver_rows['wins'] / prior_starts * 100).fillna(0)
+    df_features['team_win_percentage'] = (team_rows['wins'] / team_starts * 100).fillna(0)
+    df_features['starting_position_quality'] = df_features['GridPosition'].fillna(20)
+    df_features['driver_dnf_rate'] = (driver_rows['dnfs'] / prior_starts * 100).fillna(0)
+    df_features['driver_podium_rate'] = (driver_rows['podiums'] / prior_starts * 100).fillna(0)
+    df_features['driver_races_competed'] = driver_rows['starts'].fillna(0).astype(int)
+
+    print("✓ Added as-of values for:", ", ".join(NEW_FEATURES))
+
+    return df_features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engineer driver/team features")
+    parser.add_argument("--mode", choices=["career", "asof"], default="career",
+                        help="career: whole-career values on every row; "
+                             "asof: values known before each race (no leakage)")
+    args = parser.parse_args()
+
+    # Load combined data
+    with span("load combined") as s:
+        # Names as categoricals on the shared entity IDs: groupbys and maps run on integer codes
+        df = load_entities().categorize(read_stage('combined'))
+        s.rows = len(df)
+
+    print("\n" + "="*70)
+    print(f"FEATURE ({args.mode.upper()} MODE)")
+    print("="*70)
+
+    # Make a copy to work with
+    df_features = df.copy()
+
+    # Sort by season and round to maintain chronological order
+    df_features = df_features.sort_values(['Season', 'Round']).reset_index(drop=True)
+
+    print("\nOriginal columns:", list(df_features.columns))
+
+    with span(f"{args.mode} features", rows=len(df_features)):
+        if args.mode == "asof":
+            df_features = add_asof_features(df_features)
+        else:
+            df_features = add_features(df_features)
+
+    # ============================================================
+    # SUMMARY
+    # ============================================================
+    print("\n" + "="*70)
+    print("NEW FEATURES CREATED")
+    print("="*70)
+
+    print("\nNew columns added:")
+    for i, feat in enumerate(NEW_FEATURES, 1):
+        print(f"  {i}. {feat}")
+
+    print(f"\nTotal columns now: {len(df_features.columns)}")
+
+    # Save the engineered features
+    with span("write features", rows=len(df_features)):
+        output_file = write_dataset(df_features, 'features')
+    print(f"\n✓ Saved engineered features to: {output_file}")
+
+    # Show sample with new features
+    print("\n" + "="*70)
+    print("SAMPLE DATA WITH FEATURES")
+    print("="*70)
+
+    sample_cols = ['FullName', 'TeamName', 'Position', 'GridPosition',
+                   'driver_recent_form', 'driver_win_percentage',
+                   'team_win_percentage', 'driver_podium_rate']
+    print(df_features[sample_cols].head(15))
+
+    print("\nFeature statistics:")
+    print(df_features[NEW_FEATURES].describe())
@@ -1,64 +1,181 @@
-import fastf1
 import pandas as pd
+import argparse
 import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from f1_schedule import F1_SCHEDULE
+from storage import DATA_DIR
 
-# Set up data folder
-data_dir = "data"
-os.makedirs(data_dir, exist_ok=True)
-
-print("Starting F1 data download using manual schedule...")
-print("This will take 15-20 minutes...\n")
-
-downloaded_count = 0
-skipped_count = 0
-current_season = None
-
-for season, rnd, event_name in F1_SCHEDULE:
-    try:
-        # Print season header when it changes
-        if season != current_season:
-            print(f"\n{'='*60}")
-            print(f"SEASON {season}")
-            print(f"{'='*60}")
-            current_season = season
-        
-        # Load race session data
-        session = fastf1.get_session(season, rnd, 'R')
-        session.load()
-        
-        # Extract race results
+RESULT_COLUMNS = ['Abbreviation', 'FullName', 'TeamName', 'Position', 'GridPosition', 'Points', 'Status']
+SESSION_CACHE_DIR = os.path.join(DATA_DIR, "fastf1_cache")
+
+
+def race_file(season, rnd, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"f1_{season}_race_{rnd:02d}.csv")
+
+# ============================================================
+# Session sources
+# Anything with load_results(season, rnd) -> (DataFrame or None, session name)
+# ============================================================
+
+class FastF1Source:
+    """Live results from the FastF1 service, with its on-disk HTTP/session cache enabled"""
+
+    def __init__(self, cache_dir=SESSION_CACHE_DIR):
+        import fastf1
+        os.makedirs(cache_dir, exist_ok=True)
+        fastf1.Cache.enable_cache(cache_dir)
+        self.fastf1 = fastf1
+
+    def load_results(self, season, rnd):
+        session = self.fastf1.get_session(season, rnd, 'R')
+        # Results are all we keep, so skip laps, telemetry, weather and race control messages
+        session.load(laps=False, telemetry=False, weather=False, messages=False)
         results = session.results
-        
-        if results is not None and len(results) > 0:
-            # Select important columns
-            df = results[['Abbreviation', 'FullName', 'TeamName', 'Position', 'GridPosition', 'Points', 'Status']]
-            df['Season'] = season
-            df['Round'] = rnd
-            df['RaceName'] = session.name
-            
-            # Save to CSV file
-            file_path = f"{data_dir}/f1_{season}_race_{rnd:02d}.csv"
-            df.to_csv(file_path, index=False)
-            
-            print(f"✓ Round {rnd:2d}: {session.name:40s} ({len(df)} drivers)")
-            downloaded_count += 1
-            
-            # Small delay to avoid overwhelming the server
-            time.sleep(0.3)
+        if results is None or len(results) == 0:
+            return None, session.name
+        return results[RESULT_COLUMNS].copy(), session.name
+
+
+class FixtureSource:
+    """Replays per-race CSVs saved earlier (e.g. a copy of the data folder) instead of calling the service"""
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def load_results(self, season, rnd):
+        path = race_file(season, rnd, self.fixture_dir)
+        if not os.path.exists(path):
+            return None, "Race"
+        df = pd.read_csv(path)
+        name = df['RaceName'].iloc[0] if 'RaceName' in df.columns and len(df) else "Race"
+        return df[RESULT_COLUMNS].copy(), name
+
+# ============================================================
+# Rate limiting and retries
+# ============================================================
+
+class RateLimiter:
+    """Allows at most `rate` calls per second across all worker threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def with_retries(fn, retries=3, backoff=1.0):
+    """Call fn(), retrying with exponential backoff (plus jitter) on any exception"""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+
+
+# ============================================================
+# Fetching
+# ============================================================
+
+def fetch_round(source, season, rnd, limiter, retries, data_dir=DATA_DIR):
+    """Download one race and save it; returns (status, session name, rows)"""
+    def load():
+        limiter.wait()
+        return source.load_results(season, rnd)
+
+    results, name = with_retries(load, retries=retries)
+    if results is None:
+        return "empty", name, 0
+
+    df = results
+    df['Season'] = season
+    df['Round'] = rnd
+    df['RaceName'] = name
+
+    # Write to a temp file first so combine_data.py never sees a half-written race
+    path = race_file(season, rnd, data_dir)
+    df.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return "saved", name, len(df)
+
+
+def fetch_schedule(source, schedule=F1_SCHEDULE, workers=4, rate=2.0, retries=3, force=False,
+                   data_dir=DATA_DIR):
+    """
+    Fetch every round of the schedule that is not on disk yet; returns a
+    summary dict. Race files are written atomically, so the files on disk
+    are the resume state of an interrupted run.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    limiter = RateLimiter(rate)
+
+    todo = []
+    skipped = 0
+    for season, rnd, event_name in schedule:
+        if not force and os.path.exists(race_file(season, rnd, data_dir)):
+            skipped += 1
         else:
-            print(f"✗ Round {rnd:2d}: {event_name:40s} (No data)")
-            skipped_count += 1
-            
-    except Exception as e:
-        print(f"✗ Round {rnd:2d}: {event_name:40s} (Error: {str(e)[:30]})")
-        skipped_count += 1
-
-print(f"\n{'='*60}")
-print(f"DOWNLOAD SUMMARY")
-print(f"{'='*60}")
-print(f"✓ Successfully downloaded: {downloaded_count} races")
-print(f"✗ Skipped/Failed: {skipped_count} rounds")
-print(f"✓ Total files in data folder: {len([f for f in os.listdir(data_dir) if f.endswith('.csv')])}")
-print(f"✓ Download complete!")
+            todo.append((season, rnd, event_name))
+
+    print(f"{len(schedule)} rounds in schedule: {skipped} already on disk, {len(todo)} to fetch\n")
+
+    summary = {'downloaded': 0, 'empty': 0, 'failed': 0, 'skipped': skipped}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_round, source, season, rnd, limiter, retries, data_dir): (season, rnd, event_name)
+            for season, rnd, event_name in todo
+        }
+        for future in as_completed(futures):
+            season, rnd, event_name = futures[future]
+            try:
+                status, name, rows = future.result()
+            except Exception as e:
+                print(f"✗ {season} Round {rnd:2d}: {event_name:40s} (Error: {str(e)[:30]})")
+                summary['failed'] += 1
+                continue
+            if status == "saved":
+                print(f"✓ {season} Round {rnd:2d}: {event_name:40s} ({rows} drivers)")
+                summary['downloaded'] += 1
+            else:
+                # No file written: the race may simply not have happened yet, so the next run retries it
+                print(f"✗ {season} Round {rnd:2d}: {event_name:40s} (No data)")
+                summary['empty'] += 1
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download race results for every round in F1_SCHEDULE")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    parser.add_argument("--rate", type=float, default=2.0, help="max session loads per second")
+    parser.add_argument("--retries", type=int, default=3, help="retries per round, with exponential backoff")
+    parser.add_argument("--seasons", type=int, nargs="*", help="only these seasons")
+    parser.add_argument("--force", action="store_true", help="refetch rounds that are already on disk")
+    parser.add_argument("--fixtures", help="replay per-race CSVs from this folder instead of calling FastF1")
+    args = parser.parse_args()
+
+    schedule = [race for race in F1_SCHEDULE if not args.seasons or race[0] in args.seasons]
+    source = FixtureSource(args.fixtures) if args.fixtures else FastF1Source()
+
+    print("Starting F1 data download using manual schedule...")
+    summary = fetch_schedule(source, schedule, workers=args.workers, rate=args.rate,
+                             retries=args.retries, force=args.force)
+
+    print(f"\n{'='*60}")
+    print(f"DOWNLOAD SUMMARY")
+    print(f"{'='*60}")
+    print(f"✓ Successfully downloaded: {summary['downloaded']} races")
+    print(f"✓ Already on disk: {summary['skipped']} races")
+    print(f"✗ Skipped/Failed: {summary['empty'] + summary['failed']} rounds")
+    print(f"✓ Download complete!")
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+FORMAT_VERSION = 2
+EXPORT_DIR = "backend/data/random_forest_model"
+
+# Arrays stored one per .npy file so each can be memory-mapped on its own
+ARRAY_NAMES = ['tree_offsets', 'feature', 'threshold', 'left', 'right', 'value', 'scaler_mean', 'scaler_scale',
+               'node_feature', 'node_threshold', 'node_children']
+
+
+def float32_boundary(threshold):
+    """
+    Largest float64 v with float32(v) <= threshold, for float64 thresholds.
+
+    float32 rounding is monotonic, so float32(v) <= t means float32(v) <= t32,
+    the largest float32 not above t. Values round down to t32 below the
+    midpoint to the next float32; at the midpoint itself they round to
+    whichever of the two has an even mantissa.
+    """
+    t32 = threshold.astype(np.float32)
+    t32 = np.where(t32 > threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+    up = np.nextafter(t32, np.float32(np.inf))
+    mid = (t32.astype(np.float64) + up.astype(np.float64)) / 2
+    tie_rounds_down = (t32.view(np.int32) & 1) == 0
+    return np.where(tie_rounds_down, mid, np.nextafter(mid, -np.inf))
+
+
+def fold_scaler(feature, threshold, left, right, scaler_mean, scaler_scale):
+    """
+    The traversal arrays predict_proba walks, computed once at export time.
+
+    sklearn tests float32(x_scaled) <= t. That holds exactly when
+    x_scaled <= float32_boundary(t), and x_scaled <= b is the same test
+    as x_raw <= b * scale + mean, so the scaler moves into the
+    thresholds and rows are never transformed. Leaves test feature 0
+    against +inf and both children point back to the leaf, so a walk
+    of max_depth steps needs no leaf checks.
+    """
+    is_leaf = feature < 0
+    node_feature = np.where(is_leaf, 0, feature)
+    raw = float32_boundary(threshold) * scaler_scale[node_feature] + scaler_mean[node_feature]
+    return {
+        'node_feature': node_feature.astype(np.int64),
+        'node_threshold': np.where(is_leaf, np.inf, raw),
+        # node_children[2 * node] is the left child, node_children[2 * node + 1] the right one
+        'node_children': np.column_stack([left, right]).astype(np.int64).ravel(),
+    }
+
+
+class ForestArrays:
+    """
+    A random forest and its StandardScaler as plain NumPy arrays.
+
+    Nodes of all trees are concatenated; tree t owns nodes
+    tree_offsets[t]:tree_offsets[t+1] and child indices are global.
+    Leaves have feature == -1. value holds each node's positive-class
+    probability. node_feature, node_threshold and node_children are the
+    same trees with the scaler folded in (fold_scaler), which is all
+    predict_proba reads besides value. Loaded with mmap the arrays live
+    in the OS page cache, so every worker process on a machine shares
+    one copy.
+    """
+
+    def __init__(self, arrays, manifest):
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.manifest = manifest
+        self.feature_columns = manifest['feature_columns']
+        self.n_trees = manifest['n_trees']
+        self.max_depth = manifest['max_depth']
+        self._roots = np.asarray(self.tree_offsets[:-1], dtype=np.int64)[:, None]
+
+    def predict_proba(self, X):
+        """
+        Positive-class probability for raw (unscaled) feature rows, averaged over trees.
+
+        All trees advance together one level per step: node is a
+        (trees, rows) array of current positions, updated with a gather.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        n_features = X.shape[1]
+        flat = X.ravel()
+        offsets = (np.arange(len(X)) * n_features)[None, :]
+        node = np.repeat(self._roots, len(X), axis=1)
+        for _ in range(self.max_depth):
+            go_right = flat[offsets + self.node_feature[node]] > self.node_threshold[node]
+            node = self.node_children[2 * node + go_right]
+        return self.value[node].mean(axis=0)
+
+
+def export_forest(model, scaler, feature_columns, path=EXPORT_DIR, source_file=None):
+    """Write a fitted RandomForestClassifier and StandardScaler as a versioned array directory"""
+    trees = [est.tree_ for est in model.estimators_]
+    offsets = np.zeros(len(trees) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([t.node_count for t in trees])
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    positive = list(model.classes_).index(1)
+    for tree, offset in zip(trees, offsets[:-1]):
+        is_leaf = tree.children_left == -1
+        feature.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        # Leaves point at themselves, which lets a traversal run a fixed number of steps
+        own = np.arange(tree.node_count) + offset
+        left.append(np.where(is_leaf, own, tree.children_left + offset).astype(np.int64))
+        right.append(np.where(is_leaf, own, tree.children_right + offset).astype(np.int64))
+        counts = tree.value[:, 0, :]
+        value.append(counts[:, positive] / counts.sum(axis=1))
+
+    arrays = {
+        'tree_offsets': offsets,
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'left': np.concatenate(left),
+        'right': np.concatenate(right),
+        'value': np.concatenate(value),
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    arrays.update(fold_scaler(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+                              arrays['scaler_mean'], arrays['scaler_scale']))
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'n_trees': len(trees),
+        'n_nodes': int(offsets[-1]),
+        'max_depth': int(max(t.max_depth for t in trees)),
+        'n_features': int(model.n_features_in_),
+        'feature_columns': list(feature_columns),
+        'source_sha256': _sha256(source_file) if source_file else None,
+    }
+    # Written last: a directory without a manifest is an incomplete export
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load_forest(path=EXPORT_DIR, mmap=True):
+    """Load an exported forest; with mmap the arrays are mapped instead of read"""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"unsupported forest format {manifest['format_version']} (expected {FORMAT_VERSION})")
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        for name in ARRAY_NAMES
+    }
+    return ForestArrays(arrays, manifest)
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+if __name__ == "__main__":
+    import time
+
+    print("\n" + "="*70)
+    print("EXPORT RANDOM FOREST TO ARRAY FORMAT")
+    print("="*70)
+
+    with open("backend/data/random_forest_model.pkl", "rb") as f:
+        rf_model = pickle.load(f)
+    with open("backend/data/scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    with open("backend/data/feature_columns.pkl", "rb") as f:
+        feature_columns = pickle.load(f)
+
+    manifest = export_forest(rf_model, scaler, feature_columns,
+                             source_file="backend/data/random_forest_model.pkl")
+    print(f"\n✓ Exported {manifest['n_trees']} trees ({manifest['n_nodes']} nodes) to {EXPORT_DIR}/")
+
+    size = sum(os.path.getsize(os.path.join(EXPORT_DIR, f)) for f in os.listdir(EXPORT_DIR))
+    print(f"  Size: {size / 1024:.0f} KB (pickle: {os.path.getsize('backend/data/random_forest_model.pkl') / 1024:.0f} KB)")
+
+    start = time.perf_counter()
+    with open("backend/data/random_forest_model.pkl", "rb") as f:
+        pickle.load(f)
+    pickle_time = time.perf_counter() - start
+    start = time.perf_counter()
+    forest = load_forest()
+    load_time = time.perf_counter() - start
+    print(f"  Load time: {load_time * 1000:.2f} ms (pickle: {pickle_time * 1000:.2f} ms)")
+
+    # Same probabilities as the pickled model on random standardized rows
+    import pandas as pd
+    X_check = np.random.default_rng(0).normal(size=(500, len(feature_columns)))
+    X_raw = scaler.inverse_transform(X_check)
+    expected = rf_model.predict_proba(pd.DataFrame(X_check, columns=feature_columns))[:, 1]
+    diff = np.abs(forest.predict_proba(X_raw) - expected).max()
+    print(f"  Max difference vs sklearn: {diff:.2e}")
@@ -0,0 +1,227 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from entities import load_entities
+
+
+def race_keys(seasons, rounds):
+    """One sortable integer per race: Season * 100 + Round"""
+    return np.asarray(seasons, dtype=np.int64) * 100 + np.asarray(rounds, dtype=np.int64)
+
+
+class Blocks:
+    """
+    Rows sorted by (entity, Season, Round) with an offset array per
+    entity: entity c owns positions offsets[c]:offsets[c + 1], in
+    chronological order (ties keep their order in the results table).
+    """
+
+    def __init__(self, codes, races):
+        self.order = np.lexsort((races, codes))
+        self.races = races[self.order]
+        counts = np.bincount(codes[codes >= 0], minlength=codes.max() + 1 if len(codes) else 0)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+
+    def span(self, code, first_race=None, end_race=None):
+        """slice of entity `code`'s rows with first_race <= race < end_race (either bound optional)"""
+        if code < 0 or code + 1 >= len(self.offsets):
+            return slice(0, 0)
+        lo, hi = self.offsets[code], self.offsets[code + 1]
+        block = self.races[lo:hi]
+        start = lo + (np.searchsorted(block, first_race) if first_race is not None else 0)
+        end = lo + (np.searchsorted(block, end_race) if end_race is not None else hi - lo)
+        return slice(int(start), int(end))
+
+
+class HistoryIndex:
+    """
+    Per-driver and per-team row index over a results table.
+
+    The columns the features need are stored once per ordering (by
+    driver and by team), so a driver's last N races or a team's season
+    so far is a contiguous slice found with two binary searches inside
+    the entity's block: no mask over the whole table. Races are
+    contiguous in a third, chronological ordering.
+
+    Codes come from the entity dictionary. The table must not be
+    modified in place once it is indexed.
+    """
+
+    def __init__(self, history, entities=None):
+        entities = entities or load_entities()
+        # Names the stored dictionary does not know yet get in-memory IDs
+        entities.update(history)
+        self.entities = entities
+        self.driver_ids = {name: i for i, name in enumerate(entities.names['driver'])}
+        self.team_ids = {name: i for i, name in enumerate(entities.names['team'])}
+        races = race_keys(history['Season'], history['Round'])
+        drivers = entities.codes('driver', history['FullName'])
+        teams = entities.codes('team', history['TeamName'])
+
+        position = history['Position'].to_numpy(dtype=np.float64)
+        columns = {
+            'race': races,
+            'driver': drivers,
+            'team': teams,
+            'position': position,
+            'grid': history['GridPosition'].to_numpy(dtype=np.float64),
+            'win': position == 1,
+            'podium': position <= 3,
+            'dnf': (history['Status'] != 'Finished').to_numpy(),
+        }
+        self.by_driver = Blocks(drivers, races)
+        self.driver_columns = {name: values[self.by_driver.order] for name, values in columns.items()}
+        self.by_team = Blocks(teams, races)
+        self.team_win = columns['win'][self.by_team.order]
+
+        self.chronological = np.argsort(races, kind='stable')
+        self.race_order = races[self.chronological]
+        self.race_columns = {name: columns[name][self.chronological] for name in ('driver', 'team', 'grid')}
+
+    # ============================================================
+    # Whole-table aggregates: one prefix sum over every entity's
+    # contiguous block, indexed by entity code
+    # ============================================================
+
+    def _block_sums(self, values, blocks):
+        totals = np.concatenate([[0], np.cumsum(values, dtype=np.float64)])
+        return totals[blocks.offsets[1:]] - totals[blocks.offsets[:-1]]
+
+    def driver_totals(self, column):
+        """Sum of a driver_columns column per driver code (row counts for 'rows')"""
+        values = np.ones(len(self.by_driver.order)) if column == 'rows' else self.driver_columns[column]
+        return self._block_sums(values, self.by_driver)
+
+    def team_totals(self, column):
+        """Wins ('win') or row counts ('rows') per team code"""
+        values = np.ones(len(self.by_team.order)) if column == 'rows' else self.team_win
+        return self._block_sums(values, self.by_team)
+
+    def driver_rate(self, column):
+        """Percentage of each driver's rows where a flag column ('win', 'podium', 'dnf') is set"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.driver_totals(column) / self.driver_totals('rows') * 100
+
+    def team_win_rate(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.team_totals('win') / self.team_totals('rows') * 100
+
+    def driver_recent_form(self, races_back):
+        """Mean of each driver's last `races_back` classified positions, per driver code (NaN if none)"""
+        position = self.driver_columns['position']
+        finished = ~np.isnan(position)
+        blocks = self.by_driver
+        # Classified rows after each row, up to the end of its driver's block
+        finished_before = np.concatenate([[0], np.cumsum(finished)])
+        block_end = np.repeat(blocks.offsets[1:], np.diff(blocks.offsets))
+        block_end = np.concatenate([np.full(blocks.offsets[0], blocks.offsets[0]), block_end])
+        later = finished_before[block_end] - finished_before[1:]
+        recent = finished & (later < races_back)
+        counts = self._block_sums(recent, blocks)
+        sums = self._block_sums(np.where(recent, position, 0.0), blocks)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    def by_driver_name(self, values):
+        """Per-code values as a Series indexed by driver name, for the drivers that have rows"""
+        present = np.diff(self.by_driver.offsets) > 0
+        names = self.entities.names['driver'][:len(present)]
+        return pd.Series(values[present], index=pd.Index(names)[present], name=None).rename_axis('FullName')
+
+    def by_team_name(self, values):
+        present = np.diff(self.by_team.offsets) > 0
+        names = self.entities.names['team'][:len(present)]
+        return pd.Series(values[present], index=pd.Index(names)[present]).rename_axis('TeamName')
+
+    def driver_code(self, name):
+        return self.driver_ids.get(name, -1)
+
+    def team_code(self, name):
+        return self.team_ids.get(name, -1)
+
+    def driver_rows(self, name, season=None, before_round=None):
+        """
+        slice into driver_columns: the driver's rows in `season` (all
+        seasons if None), only races before `before_round` if given
+        """
+        first = season * 100 if season is not None else None
+        end = season * 100 + before_round if before_round is not None else (
+            (season + 1) * 100 if season is not None else None)
+        return self.by_driver.span(self.driver_code(name), first, end)
+
+    def last_races(self, name, n, season=None, before_round=None):
+        """The driver's last n classified finishing positions in that window"""
+        rows = self.driver_rows(name, season, before_round)
+        positions = self.driver_columns['position'][rows]
+        return positions[~np.isnan(positions)][-n:]
+
+    def team_win_percentage(self, team, season, before_round):
+        """Share of the team's result rows in `season` before `before_round` that were wins, or NaN"""
+        if team is None or (isinstance(team, float) and np.isnan(team)):
+            return np.nan
+        rows = self.by_team.span(self.team_code(team), season * 100, season * 100 + before_round)
+        wins = self.team_win[rows]
+        return wins.mean() * 100 if len(wins) else np.nan
+
+    def race_rows(self, season, rnd=None):
+        """slice into race_columns: one race, or a whole season if rnd is None"""
+        if rnd is None:
+            first, end = season * 100, (season + 1) * 100
+        else:
+            first, end = season * 100 + rnd, season * 100 + rnd + 1
+        return slice(int(np.searchsorted(self.race_order, first)), int(np.searchsorted(self.race_order, end)))
+
+    def field(self, season, rnd):
+        """
+        (FullName, TeamName) of a race's entry list in order of appearance,
+        each driver with their last team there; the season's drivers if
+        the race is not in the table
+        """
+        rows = self.race_rows(season, rnd)
+        if rows.start == rows.stop:
+            rows = self.race_rows(season)
+        last_team = {}
+        for driver, team in zip(self.race_columns['driver'][rows], self.race_columns['team'][rows]):
+            if driver < 0:
+                continue
+            # Like groupby().last(): the last known team, missing teams skipped
+            if team >= 0 or driver not in last_team:
+                last_team[driver] = team if team >= 0 else last_team.get(driver, -1)
+        driver_names = self.entities.categories('driver').categories
+        team_names = self.entities.categories('team').categories
+        return pd.DataFrame({
+            'FullName': [driver_names[d] for d in last_team],
+            'TeamName': [team_names[t] if t >= 0 else None for t in last_team.values()],
+        }, columns=['FullName', 'TeamName'])
+
+    def race_grid(self, season, rnd):
+        """{driver name: first known grid position} for one race"""
+        rows = self.race_rows(season, rnd)
+        grid = {}
+        driver_names = self.entities.categories('driver').categories
+        for code, position in zip(self.race_columns['driver'][rows], self.race_columns['grid'][rows]):
+            if code < 0:
+                continue
+            name = driver_names[code]
+            if name not in grid and not np.isnan(position):
+                grid[name] = position
+        return grid
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def history_index(history):
+    """The HistoryIndex of this frame, built on first use and kept while the frame is alive"""
+    key = id(history)
+    entry = _indexes.get(key)
+    if entry is not None and entry[0]() is history:
+        return entry[1]
+    index = HistoryIndex(history)
+    with _indexes_lock:
+        _indexes[key] = (weakref.ref(history, lambda _, key=key: _indexes.pop(key, None)), index)
+    return index
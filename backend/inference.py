@@ -0,0 +1,248 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from entities import load_entities
+from forest_artifact import load_forest
+from history_index import history_index
+from storage import read_stage
+
+# Defaults used by las_vegas_predict.py when a driver has no history yet
+DEFAULT_GRID = 20
+DEFAULT_FORM = 999
+# Races averaged into driver_recent_form
+RECENT_RACES = 5
+
+
+class ModelBundle:
+    """Scaler, model and feature list that were saved together by prepare_ml.py / model.py"""
+
+    def __init__(self, scaler, model, feature_columns):
+        self.scaler = scaler
+        self.model = model
+        self.feature_columns = list(feature_columns)
+
+    @classmethod
+    def load(cls, scaler_path, model_path, feature_columns_path):
+        with open(scaler_path, "rb") as f:
+            scaler = pickle.load(f)
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        with open(feature_columns_path, "rb") as f:
+            feature_columns = pickle.load(f)
+        return cls(scaler, model, feature_columns)
+
+    def predict_proba(self, features):
+        """Win probability for every row of a feature DataFrame, in one model call"""
+        return self.predict_matrix(features[self.feature_columns].to_numpy(dtype=np.float64))
+
+    def predict_matrix(self, X):
+        """Win probability for raw feature rows already in feature_columns order"""
+        X = pd.DataFrame(X, columns=self.feature_columns)
+        X_scaled = pd.DataFrame(self.scaler.transform(X), columns=self.feature_columns)
+        return self.model.predict_proba(X_scaled)[:, 1]
+
+
+class ForestBundle:
+    """An exported forest (forest_artifact.py) behind the same interface as ModelBundle"""
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.feature_columns = list(forest.feature_columns)
+
+    def predict_proba(self, features):
+        return self.predict_matrix(features[self.feature_columns].to_numpy(dtype=np.float64))
+
+    def predict_matrix(self, X):
+        return self.forest.predict_proba(X)
+
+
+def load_bundle(scaler_path, model_path, feature_columns_path, export_dir=None):
+    """
+    Prefer the exported array format (no unpickling, pages shared between
+    workers) when it was exported from the current pickled model.
+    """
+    if export_dir and os.path.exists(os.path.join(export_dir, "manifest.json")):
+        try:
+            forest = load_forest(export_dir)
+        except ValueError as e:
+            # An export from an older format version: rerun forest_artifact.py to refresh it
+            print(f"✗ Ignoring {export_dir}: {e}")
+            forest = None
+        with open(model_path, "rb") as f:
+            current = hashlib.sha256(f.read()).hexdigest()
+        if forest is not None and forest.manifest.get('source_sha256') == current:
+            return ForestBundle(forest)
+    return ModelBundle.load(scaler_path, model_path, feature_columns_path)
+
+
+def load_history():
+    """Cleaned race results (output of clean_data.py), sorted chronologically, names as categoricals"""
+    df = load_entities().categorize(read_stage('cleaned'))
+    return df.sort_values(['Season', 'Round'], kind='stable').reset_index(drop=True)
+
+
+def driver_stats(index, name, season, rnd):
+    """A driver's season-so-far values before round `rnd`, from their contiguous rows in the index"""
+    rows = index.driver_rows(name, season, rnd)
+    columns = index.driver_columns
+    starts = rows.stop - rows.start
+    if starts == 0:
+        return (np.nan,) * 5 + (0,)
+    grid = columns['grid'][rows]
+    grid = grid[~np.isnan(grid)]
+    form = index.last_races(name, RECENT_RACES, season, rnd)
+    return (
+        form.mean() if len(form) else np.nan,
+        columns['win'][rows].mean() * 100,
+        columns['podium'][rows].mean() * 100,
+        columns['dnf'][rows].mean() * 100,
+        grid.mean() if len(grid) else np.nan,
+        starts,
+    )
+
+
+def build_race_features(history, season, rnd, grid=None):
+    """
+    Feature matrix for every driver in a race, using only that season's
+    results before the race (same definitions as las_vegas_predict.py).
+    Each driver's and team's rows are a slice of the history's index
+    (history_index.py), so no step scans the whole history.
+
+    grid: optional DataFrame with FullName, GridPosition and optionally
+    TeamName, replacing the entry list and grid positions.
+    """
+    index = history_index(history)
+    if grid is None:
+        field = index.field(season, rnd)
+    else:
+        field = grid[['FullName']].copy()
+        known_teams = index.field(season, rnd).set_index('FullName')['TeamName']
+        field['TeamName'] = field['FullName'].map(known_teams)
+        if 'TeamName' in grid.columns:
+            field['TeamName'] = grid['TeamName'].where(grid['TeamName'].notna(), field['TeamName']).values
+
+    names = field['FullName'].tolist()
+    teams = field['TeamName'].tolist()
+    stats = np.array([driver_stats(index, name, season, rnd) for name in names], dtype=np.float64).reshape(-1, 6)
+    form, win, podium, dnf, avg_grid, starts = stats.T
+    team_win = np.array([index.team_win_percentage(team, season, rnd) for team in teams], dtype=np.float64)
+
+    if grid is not None:
+        grid_position = grid['GridPosition'].to_numpy(dtype=np.float64)
+    else:
+        actual_grid = index.race_grid(season, rnd)
+        grid_position = np.array([actual_grid.get(name, np.nan) for name in names], dtype=np.float64)
+    grid_position = np.where(np.isnan(grid_position), avg_grid, grid_position)
+
+    return pd.DataFrame({
+        'FullName': names,
+        'TeamName': teams,
+        'driver_recent_form': np.nan_to_num(form, nan=DEFAULT_FORM),
+        'driver_win_percentage': np.nan_to_num(win),
+        'driver_podium_rate': np.nan_to_num(podium),
+        'driver_dnf_rate': np.nan_to_num(dnf),
+        'driver_races_competed': starts.astype(np.int64),
+        'team_win_percentage': np.nan_to_num(team_win),
+        'GridPosition': np.nan_to_num(grid_position, nan=DEFAULT_GRID),
+    })
+
+
+def _season_to_date(rows, keys, columns):
+    """Running totals of `columns` per keys + Season, one row per race (inclusive of that race)"""
+    per_race = rows.groupby(['Season'] + keys + ['Round'], sort=False, observed=True)[columns].sum()
+    totals = per_race.groupby(level=['Season'] + keys, sort=False, observed=True).cumsum()
+    return totals.reset_index().sort_values('Round', kind='stable')
+
+
+def _before(targets, table, keys):
+    """For every target row, the table's values after the last race strictly before its Round"""
+    targets = targets.reset_index().sort_values('Round', kind='stable')
+    joined = pd.merge_asof(targets, table, on='Round', by=['Season'] + keys, allow_exact_matches=False)
+    return joined.set_index('index').sort_index()
+
+
+def build_calendar_features(history, races):
+    """
+    build_race_features for many races at once: one vectorized pass
+    instead of one filter-and-groupby per race, with the same values.
+
+    races: DataFrame with Season and Round. Rows come back grouped by race
+    in the order of `races`, each field in build_race_features's order.
+    Races of seasons missing from history are dropped.
+    """
+    # The store keeps Season/Round as int16/int8; merge_asof needs identical key types
+    races = races[['Season', 'Round']].astype(np.int64).drop_duplicates().reset_index(drop=True)
+    races['race_order'] = np.arange(len(races))
+    history = history.assign(Season=history['Season'].astype(np.int64), Round=history['Round'].astype(np.int64))
+
+    # Field: the actual entry list for races in history, else the season's drivers
+    entries = history.groupby(['Season', 'Round', 'FullName'], sort=False, observed=True).agg(
+        TeamName=('TeamName', 'last'), GridPosition=('GridPosition', 'first')).reset_index()
+    known = races.merge(entries, on=['Season', 'Round'])
+    season_drivers = history.groupby(['Season', 'FullName'], sort=False, observed=True)['TeamName'].last().reset_index()
+    upcoming = races[~races.set_index(['Season', 'Round']).index.isin(entries.set_index(['Season', 'Round']).index)]
+    upcoming = upcoming.merge(season_drivers, on='Season')
+    field = pd.concat([known, upcoming], ignore_index=True)
+    field['entry_order'] = np.arange(len(field))
+
+    # Per-row flags; duplicated rows count twice, as they do in build_race_features
+    position = history['Position']
+    rows = pd.DataFrame({
+        'Season': history['Season'],
+        'Round': history['Round'],
+        'FullName': history['FullName'],
+        'TeamName': history['TeamName'],
+        'starts': 1,
+        'wins': (position == 1).astype(int),
+        'podiums': (position <= 3).astype(int),
+        'dnfs': (history['Status'] != 'Finished').astype(int),
+        'grid_sum': history['GridPosition'].fillna(0),
+        'grid_count': history['GridPosition'].notna().astype(int),
+    })
+    driver = _before(field, _season_to_date(rows, ['FullName'], ['starts', 'wins', 'podiums', 'dnfs',
+                                                                 'grid_sum', 'grid_count']), ['FullName'])
+    team = _before(field[['Season', 'Round', 'TeamName']].dropna(),
+                   _season_to_date(rows.dropna(subset=['TeamName']), ['TeamName'], ['starts', 'wins']),
+                   ['TeamName'])
+
+    # Recent form: mean of the last 5 classified rows, as of each race
+    finished = history.dropna(subset=['Position'])
+    finished = finished.assign(form=finished.groupby(['Season', 'FullName'], sort=False, observed=True)['Position']
+                               .transform(lambda p: p.rolling(5, min_periods=1).mean()))
+    form = finished.groupby(['Season', 'FullName', 'Round'], sort=False, observed=True)['form'].last()
+    form = _before(field, form.reset_index().sort_values('Round', kind='stable'), ['FullName'])['form']
+
+    starts = driver['starts'].replace(0, np.nan)
+    features = field[['FullName', 'TeamName']].copy()
+    features['driver_recent_form'] = form
+    features['driver_win_percentage'] = driver['wins'] / starts * 100
+    features['driver_podium_rate'] = driver['podiums'] / starts * 100
+    features['driver_dnf_rate'] = driver['dnfs'] / starts * 100
+    features['driver_races_competed'] = driver['starts']
+    features['team_win_percentage'] = team['wins'] / team['starts'].replace(0, np.nan) * 100
+    avg_grid = driver['grid_sum'] / driver['grid_count'].replace(0, np.nan)
+    features['GridPosition'] = field['GridPosition'].fillna(avg_grid).fillna(DEFAULT_GRID)
+    features = features.fillna({
+        'driver_recent_form': DEFAULT_FORM,
+        'driver_win_percentage': 0,
+        'driver_podium_rate': 0,
+        'driver_dnf_rate': 0,
+        'driver_races_competed': 0,
+        'team_win_percentage': 0,
+    })
+    features['driver_races_competed'] = features['driver_races_competed'].astype(int)
+    features.insert(0, 'Round', field['Round'])
+    features.insert(0, 'Season', field['Season'])
+    order = np.lexsort((field['entry_order'], field['race_order']))
+    return features.iloc[order].reset_index(drop=True)
+
+
+def predict_race(bundle, history, season, rnd, grid=None):
+    """Features and win probability for the whole field, sorted by probability"""
+    features = build_race_features(history, season, rnd, grid)
+    features['win_probability'] = bundle.predict_proba(features)
+    return features.sort_values('win_probability', ascending=False).reset_index(drop=True)
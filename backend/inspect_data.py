@@ -1,8 +1,7 @@
-import pandas as pd
-import numpy as np
+from storage import read_stage
 
 # Load combined data
-df = pd.read_csv("backend/data/f1_all_races_combined.csv")
+df = read_stage('combined')
 
 print("\n" + "="*70)
 print("INSPECT RAW DATA")
@@ -0,0 +1,158 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+# Set F1_TRACE to a file to record spans: *.json gives a Chrome trace
+# (open in chrome://tracing or ui.perfetto.dev), anything else JSON lines.
+# Several processes (e.g. pipeline.py stages) can append to the same file.
+TRACE_ENV = "F1_TRACE"
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def trace_path():
+    return os.environ.get(TRACE_ENV) or None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+class Span:
+    """One timed region; set .rows (or other fields) inside the block to record them"""
+
+    def __init__(self, name, rows=None, **fields):
+        self.name = name
+        self.rows = rows
+        self.fields = fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+@contextmanager
+def span(name, rows=None, **fields):
+    """
+    Time a block: wall and CPU time, peak RSS and an optional row count.
+
+        with span("fit random forest", rows=len(X_train)):
+            model.fit(X_train, y_train)
+
+    Does nothing but run the block when F1_TRACE is not set.
+    """
+    current = Span(name, rows, **fields)
+    path = trace_path()
+    if path is None:
+        yield current
+        return
+
+    stack = _stack()
+    parent = stack[-1].name if stack else None
+    stack.append(current)
+    start_epoch = time.time()
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield current
+    finally:
+        stack.pop()
+        _emit(path, {
+            'name': name,
+            'parent': parent,
+            'depth': len(stack),
+            'script': _script_name(),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'start': start_epoch,
+            'wall_s': time.perf_counter() - start,
+            'cpu_s': time.process_time() - start_cpu,
+            'peak_rss_mb': peak_rss_mb(),
+            'rows': current.rows,
+            **current.fields,
+        })
+
+
+def timed(name=None):
+    """Decorator form of span(); the span is named after the function by default"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ============================================================
+# Output
+# ============================================================
+
+def _script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+
+def _chrome_event(record):
+    """Complete ("X") event in the Chrome trace-event format, times in microseconds"""
+    args = {k: v for k, v in record.items() if k not in ('name', 'pid', 'tid', 'start', 'wall_s')}
+    return {
+        'name': record['name'],
+        'cat': record['script'],
+        'ph': 'X',
+        'ts': record['start'] * 1e6,
+        'dur': record['wall_s'] * 1e6,
+        'pid': record['pid'],
+        'tid': record['tid'],
+        'args': args,
+    }
+
+
+def _emit(path, record):
+    if path.endswith(".json"):
+        line = json.dumps(_chrome_event(record), default=str) + ",\n"
+        try:
+            # The array's closing bracket is optional, so processes can keep appending
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, b"[\n")
+            os.close(fd)
+        except FileExistsError:
+            pass
+    else:
+        line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        with open(path, "a") as f:
+            f.write(line)
+
+# ============================================================
+# Whole-script span
+# ============================================================
+
+def _start_script_span():
+    """Record the importing script's whole run as one top-level span"""
+    context = span(_script_name(), kind="script")
+    context.__enter__()
+    atexit.register(context.__exit__, None, None, None)
+
+
+if trace_path() and __name__ != "__main__":
+    _start_script_span()
@@ -0,0 +1,272 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow simulations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# When set, every process writes its samples to <dir>/metrics_<pid>.json
+# and /metrics merges the files, so gunicorn-style workers report together
+MULTIPROC_DIR_ENV = "F1_METRICS_DIR"
+FLUSH_INTERVAL = 1.0
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def reset(self):
+        # Called in a freshly forked child: the old lock may be held by a thread that no longer exists
+        self.lock = threading.Lock()
+        self.values = {}
+
+
+class Counter(Metric):
+    """Monotonic count; summed across processes"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name + "_total", key, value) for key, value in self.values.items()]
+
+
+class Gauge(Metric):
+    """Current value; reported per process (with a pid label) across processes"""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Histogram(Metric):
+    """Bucketed observations with sum and count; summed across processes"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        """Cumulative le buckets, then _sum and _count, per label set"""
+        out = []
+        with self.lock:
+            for key, (counts, total, count) in self.values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    out.append((self.name + "_bucket", key + (_format_bound(bound),), cumulative))
+                out.append((self.name + "_sum", key, total))
+                out.append((self.name + "_count", key, count))
+        return out
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def process_memory_bytes():
+    """(current RSS, peak RSS) of this process; current is None where /proc is missing"""
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        peak = None
+    return current, peak
+
+
+class Registry:
+    """
+    The metrics of one process, rendered in the Prometheus text format.
+
+    Single process: /metrics renders the in-memory values. With
+    F1_METRICS_DIR set, a background thread in each process flushes its
+    values to a per-pid JSON file every FLUSH_INTERVAL seconds and
+    render() merges all files: counters and histograms are summed
+    (including processes that have exited), gauges are kept per live pid.
+    Empty the directory when the server (re)starts.
+    """
+
+    def __init__(self, multiproc_dir=None):
+        self.metrics = []
+        self.multiproc_dir = multiproc_dir if multiproc_dir is not None else os.environ.get(MULTIPROC_DIR_ENV)
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+        self.memory = self.gauge("process_resident_memory_bytes", "Resident memory of the process")
+        self.peak_memory = self.gauge("process_peak_resident_memory_bytes", "Peak resident memory of the process")
+        # A forked worker starts from zero; the parent's counts stay in the parent's file
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def _after_fork(self):
+        for metric in self.metrics:
+            metric.reset()
+        self._flusher_pid = None
+
+    # ============================================================
+    # Snapshots and multi-process files
+    # ============================================================
+
+    def snapshot(self):
+        """{name: {kind, help, labelnames, samples}} for this process"""
+        current, peak = process_memory_bytes()
+        if current is not None:
+            self.memory.set(current)
+        if peak is not None:
+            # ru_maxrss lags the current RSS slightly
+            self.peak_memory.set(max(peak, current or 0))
+        return {
+            m.name: {'kind': m.kind, 'help': m.help, 'labelnames': list(m.labelnames),
+                     'samples': [[name, list(key), value] for name, key, value in m.samples()]}
+            for m in self.metrics
+        }
+
+    def _path(self, pid):
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    def flush(self):
+        if not self.multiproc_dir:
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        path = self._path(os.getpid())
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def ensure_flusher(self):
+        """Start this process's flush thread (once per pid, so it survives forks)"""
+        if not self.multiproc_dir or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"✗ Metrics flush failed: {e}")
+
+    def collect(self):
+        """Snapshots to render: this process, plus every other process's file"""
+        if not self.multiproc_dir:
+            return [(os.getpid(), self.snapshot())]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, "metrics_*.json")):
+            pid = int(os.path.basename(path)[len("metrics_"):-len(".json")])
+            try:
+                with open(path) as f:
+                    snapshots.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue  # being replaced right now
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        merged = {}
+        for pid, snapshot in self.collect():
+            alive = _pid_alive(pid)
+            for name, metric in snapshot.items():
+                entry = merged.setdefault(name, {'kind': metric['kind'], 'help': metric['help'],
+                                                 'labelnames': metric['labelnames'], 'samples': {}})
+                for sample_name, key, value in metric['samples']:
+                    if metric['kind'] == "gauge":
+                        if not alive:
+                            continue
+                        key = key + [str(pid)]
+                    sample_key = (sample_name, tuple(key))
+                    entry['samples'][sample_key] = entry['samples'].get(sample_key, 0) + value
+
+        lines = []
+        for name, entry in merged.items():
+            labelnames = list(entry['labelnames'])
+            if entry['kind'] == "gauge" and self.multiproc_dir:
+                labelnames.append("pid")
+            # Counter samples carry the _total suffix, so their HELP/TYPE lines do too
+            family = name + "_total" if entry['kind'] == "counter" else name
+            lines.append(f"# HELP {family} {entry['help']}")
+            lines.append(f"# TYPE {family} {entry['kind']}")
+            for (sample_name, key), value in entry['samples'].items():
+                names = labelnames + (["le"] if sample_name.endswith("_bucket") else [])
+                labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, key))
+                lines.append(f"{sample_name}{{{labels}}} {value}" if labels else f"{sample_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _pid_alive(pid):
+    # os.kill(pid, 0) would terminate the process on Windows
+    if pid == os.getpid() or os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
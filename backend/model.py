@@ -1,17 +1,22 @@
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+import json
+import os
 import pickle
+from instrument import span
+from storage import read_split
+
+BEST_PARAMS_FILE = "backend/data/best_params.json"
 
 print("\n" + "="*70)
 print("ADVANCED MODEL - RANDOM FOREST ONLY")
 print("="*70)
 
 # Load prepared data
-X_train = pd.read_csv("backend/data/X_train_scaled.csv")
-X_test = pd.read_csv("backend/data/X_test_scaled.csv")
-y_train = pd.read_csv("backend/data/y_train.csv").squeeze()
-y_test = pd.read_csv("backend/data/y_test.csv").squeeze()
+with span("load splits"):
+    X_train, y_train = read_split('train')
+    X_test, y_test = read_split('test')
 
 print(f"\nLoaded data: X_train {X_train.shape}, X_test {X_test.shape}")
 
@@ -19,21 +24,33 @@ print("\n" + "="*70)
 print("TRAINING RANDOM FOREST")
 print("="*70)
 
+rf_params = {
+    'n_estimators': 100,
+    'max_depth': 15,
+    'min_samples_split': 10,
+    'min_samples_leaf': 4,
+    'class_weight': 'balanced',
+}
+
+# Parameters found by tune_model.py replace the defaults when present
+if os.path.exists(BEST_PARAMS_FILE):
+    with open(BEST_PARAMS_FILE) as f:
+        rf_params.update(json.load(f))
+    print(f"✓ Using tuned parameters from {BEST_PARAMS_FILE}")
+
 rf_model = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=15,
-    min_samples_split=10,
-    min_samples_leaf=4,
+    **rf_params,
     random_state=42,
-    class_weight='balanced',
     n_jobs=-1
 )
 
-rf_model.fit(X_train, y_train)
+with span("fit random forest", rows=len(X_train), n_estimators=rf_params['n_estimators']):
+    rf_model.fit(X_train, y_train)
 print("✓ Random Forest trained!")
 
-y_test_pred_rf = rf_model.predict(X_test)
-y_test_pred_proba_rf = rf_model.predict_proba(X_test)[:, 1]
+with span("predict test set", rows=len(X_test)):
+    y_test_pred_rf = rf_model.predict(X_test)
+    y_test_pred_proba_rf = rf_model.predict_proba(X_test)[:, 1]
 
 rf_metrics = {
     'accuracy': accuracy_score(y_test, y_test_pred_rf),
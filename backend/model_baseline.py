@@ -3,16 +3,17 @@ import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix, classification_report
 import pickle
+from instrument import span
+from storage import read_split
 
 print("\n" + "="*70)
 print("BASELINE MODEL - LOGISTIC REGRESSION")
 print("="*70)
 
 # Load prepared data
-X_train = pd.read_csv("backend/data/X_train_scaled.csv")
-X_test = pd.read_csv("backend/data/X_test_scaled.csv")
-y_train = pd.read_csv("backend/data/y_train.csv").squeeze()
-y_test = pd.read_csv("backend/data/y_test.csv").squeeze()
+with span("load splits"):
+    X_train, y_train = read_split('train')
+    X_test, y_test = read_split('test')
 
 print(f"\nLoaded training data: {X_train.shape}")
 print(f"Loaded testing data: {X_test.shape}")
@@ -34,7 +35,8 @@ model = LogisticRegression(
 
 # Train model
 print("\nTraining model...")
-model.fit(X_train, y_train)
+with span("fit logistic regression", rows=len(X_train)):
+    model.fit(X_train, y_train)
 print("✓ Model trained successfully!")
 
 # ============================================================
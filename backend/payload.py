@@ -0,0 +1,52 @@
+import gzip
+import hashlib
+import os
+import time
+from email.utils import formatdate
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class Payload:
+    """
+    One version of an API response body, with everything needed for
+    conditional and compressed responses computed up front: a content-hash
+    ETag, a Last-Modified date and gzip/brotli encoded variants.
+    """
+
+    def __init__(self, body, last_modified=None):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = int(last_modified if last_modified is not None else time.time())
+        self.last_modified_http = formatdate(self.last_modified, usegmt=True)
+        self.encoded = {"identity": body}
+        self.encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+    @classmethod
+    def from_files(cls, body, paths):
+        mtimes = [os.path.getmtime(p) for p in paths if os.path.exists(p)]
+        return cls(body, max(mtimes) if mtimes else None)
+
+    def etag_for(self, encoding):
+        """Each encoding is a different representation, so it gets its own ETag"""
+        if encoding == "identity":
+            return self.etag
+        return f"{self.etag}-{encoding}"
+
+    def all_etags(self):
+        return [self.etag_for(encoding) for encoding in self.encoded]
+
+    def choose_encoding(self, accept_encodings):
+        """Pick the smallest variant the client accepts (werkzeug Accept object)"""
+        best = "identity"
+        for encoding in ("br", "gzip"):
+            if encoding not in self.encoded or not accept_encodings.quality(encoding):
+                continue
+            if len(self.encoded[encoding]) < len(self.encoded[best]):
+                best = encoding
+        return best
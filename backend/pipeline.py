@@ -0,0 +1,290 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = os.path.join(ROOT_DIR, "backend", "data", "pipeline_state.json")
+
+
+class Stage:
+    """
+    One backend script with the files it reads and writes.
+
+    inputs/outputs are paths relative to the repo root; they may be globs
+    or directories (e.g. a Parquet dataset). code lists the source files
+    whose changes should also force a rerun.
+    """
+
+    def __init__(self, name, script, inputs, outputs, code=(), manual=False):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = [script] + list(code)
+        # Manual stages (network downloads) only run when asked for explicitly
+        self.manual = manual
+
+
+STORAGE = "backend/storage.py"
+ENTITIES = "backend/entities.py"
+HISTORY_INDEX = "backend/history_index.py"
+# entities.py reads circuit names from the schedule
+SCHEDULE = "backend/f1_schedule.py"
+
+STAGES = [
+    Stage("fetch", "backend/fetch_race_data.py",
+          inputs=[SCHEDULE],
+          outputs=["backend/data/f1_*_race_*.csv"], manual=True),
+    Stage("combine", "backend/combine_data.py",
+          inputs=["backend/data/f1_*_race_*.csv"],
+          outputs=["backend/data/store/combined", "backend/data/entities.json"], code=[STORAGE, ENTITIES, SCHEDULE]),
+    Stage("features", "backend/features.py",
+          inputs=["backend/data/store/combined", "backend/data/entities.json"],
+          outputs=["backend/data/store/features"], code=[STORAGE, ENTITIES, SCHEDULE, HISTORY_INDEX]),
+    Stage("clean", "backend/clean_data.py",
+          inputs=["backend/data/store/features"],
+          outputs=["backend/data/store/cleaned"], code=[STORAGE]),
+    Stage("prepare_ml", "backend/prepare_ml.py",
+          inputs=["backend/data/store/cleaned"],
+          outputs=["backend/data/store/train", "backend/data/store/test",
+                   "backend/data/scaler.pkl", "backend/data/feature_columns.pkl"], code=[STORAGE]),
+    Stage("model_baseline", "backend/model_baseline.py",
+          inputs=["backend/data/store/train", "backend/data/store/test"],
+          outputs=["backend/data/logistic_regression_model.pkl", "backend/data/baseline_metrics.pkl"],
+          code=[STORAGE]),
+    Stage("model", "backend/model.py",
+          inputs=["backend/data/store/train", "backend/data/store/test", "backend/data/best_params.json"],
+          outputs=["backend/data/random_forest_model.pkl", "backend/data/all_models_metrics.pkl"],
+          code=[STORAGE]),
+    Stage("export_model", "backend/forest_artifact.py",
+          inputs=["backend/data/random_forest_model.pkl", "backend/data/scaler.pkl",
+                  "backend/data/feature_columns.pkl"],
+          outputs=["backend/data/random_forest_model"]),
+    Stage("compare", "backend/compare_models.py",
+          inputs=["backend/data/all_models_metrics.pkl", "backend/data/baseline_metrics.pkl"],
+          outputs=["backend/model_comparison.png"]),
+    Stage("predict", "backend/las_vegas_predict.py",
+          inputs=["backend/data/store/cleaned", "backend/data/scaler.pkl",
+                  "backend/data/random_forest_model.pkl", "backend/data/feature_columns.pkl",
+                  "backend/data/random_forest_model"],
+          outputs=["backend/data/las_vegas_2025_predictions_general.csv"],
+          code=[STORAGE, "backend/inference.py", ENTITIES, HISTORY_INDEX, "backend/forest_artifact.py",
+                SCHEDULE]),
+    Stage("score_calendar", "backend/score_calendar.py",
+          inputs=["backend/data/store/cleaned", "backend/data/scaler.pkl",
+                  "backend/data/random_forest_model.pkl", "backend/data/feature_columns.pkl",
+                  "backend/data/random_forest_model"],
+          outputs=["backend/data/store/calendar_predictions"],
+          code=[STORAGE, "backend/inference.py", ENTITIES, HISTORY_INDEX, "backend/forest_artifact.py",
+                SCHEDULE, "backend/las_vegas_predict.py"]),
+    Stage("visualize_data", "backend/visualize_data.py",
+          inputs=["backend/data/store/combined"],
+          outputs=["backend/top_drivers_wins.png"], code=[STORAGE]),
+    Stage("visualize_lv_predictions", "backend/visualize_lv_predictions.py",
+          inputs=["backend/data/las_vegas_2025_predictions_general.csv"],
+          outputs=["backend/top_lv_drivers_probabilities.png"]),
+    Stage("visualize_predictions", "backend/visualize_predictions.py",
+          inputs=["backend/data/las_vegas_2025_predictions.csv"],
+          outputs=["backend/las_vegas_2025_win_probabilities.png"]),
+]
+
+# ============================================================
+# Hashing
+# ============================================================
+
+def expand(pattern):
+    """All files behind a path, glob or directory, sorted"""
+    files = []
+    for path in sorted(glob.glob(os.path.join(ROOT_DIR, pattern))):
+        if os.path.isdir(path):
+            for dirpath, _, names in os.walk(path):
+                files.extend(os.path.join(dirpath, n) for n in names)
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def hash_files(patterns):
+    sha = hashlib.sha256()
+    for pattern in patterns:
+        sha.update(pattern.encode())
+        for path in expand(pattern):
+            sha.update(os.path.relpath(path, ROOT_DIR).encode())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+    return sha.hexdigest()
+
+
+def stage_key(stage):
+    """Changes whenever an input file or the stage's code changes"""
+    return hash_files(stage.code) + hash_files(stage.inputs)
+
+
+def outputs_exist(stage):
+    return all(expand(pattern) for pattern in stage.outputs)
+
+# ============================================================
+# Graph
+# ============================================================
+
+def dependencies(stages):
+    """stage name -> names of the stages producing its inputs"""
+    producers = {}
+    for stage in stages:
+        for pattern in stage.outputs:
+            producers[pattern] = stage.name
+    return {
+        stage.name: {producers[p] for p in stage.inputs if p in producers and producers[p] != stage.name}
+        for stage in stages
+    }
+
+
+def select(stages, targets, include_manual):
+    """Stages needed for the targets (all by default), with their upstream stages"""
+    by_name = {s.name: s for s in stages}
+    deps = dependencies(stages)
+    wanted = set(targets) if targets else {s.name for s in stages if not s.manual}
+    if include_manual:
+        wanted |= {s.name for s in stages if s.manual}
+    todo = list(wanted)
+    while todo:
+        name = todo.pop()
+        for dep in deps[name]:
+            if dep not in wanted and (include_manual or not by_name[dep].manual):
+                wanted.add(dep)
+                todo.append(dep)
+    return [s for s in stages if s.name in wanted]
+
+# ============================================================
+# Running
+# ============================================================
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+
+def run_script(stage, verbose, trace=None):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    if trace:
+        # Picked up by instrument.py in the stage's process
+        env["F1_TRACE"] = trace
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, stage.script], cwd=ROOT_DIR, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if verbose or proc.returncode != 0:
+        print(proc.stdout[-4000:])
+        print(proc.stderr[-4000:])
+    return proc.returncode, elapsed
+
+
+def run_pipeline(stages, jobs=4, force=False, dry_run=False, verbose=False, trace=None):
+    """Run stages in dependency order, independent ones in parallel, skipping unchanged ones"""
+    state = load_state()
+    deps = dependencies(stages)
+    names = {s.name for s in stages}
+    pending = {s.name: s for s in stages}
+    done, failed = set(), set()
+    results = {}
+
+    def ready(name):
+        return all(d in done or d not in names for d in deps[name])
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while pending or running:
+            # Stages whose upstream failed can never run
+            for name in [n for n in pending if deps[n] & failed]:
+                print(f"✗ {name:26s} skipped (upstream failed)")
+                failed.add(name)
+                results[name] = "blocked"
+                del pending[name]
+
+            for name in [n for n in pending if ready(n)]:
+                stage = pending.pop(name)
+                key = stage_key(stage)
+                upstream_reran = dry_run and any(results.get(d) == "would run" for d in deps[name])
+                if not force and not upstream_reran and state.get(name) == key and outputs_exist(stage):
+                    print(f"- {name:26s} up to date")
+                    results[name] = "cached"
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"> {name:26s} would run")
+                    results[name] = "would run"
+                    done.add(name)
+                    continue
+                print(f"> {name:26s} running...")
+                running[pool.submit(run_script, stage, verbose, trace)] = (stage, key)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, _ = running.pop(future)
+                returncode, elapsed = future.result()
+                if returncode == 0:
+                    # Key is taken after the run: inputs may include this stage's own outputs
+                    state[stage.name] = stage_key(stage)
+                    save_state(state)
+                    print(f"✓ {stage.name:26s} done in {elapsed:.1f}s")
+                    results[stage.name] = "ran"
+                    done.add(stage.name)
+                else:
+                    print(f"✗ {stage.name:26s} failed (exit code {returncode})")
+                    results[stage.name] = "failed"
+                    failed.add(stage.name)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the backend pipeline, skipping unchanged stages")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--fetch", action="store_true", help="also download new races first")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if nothing changed")
+    parser.add_argument("--jobs", type=int, default=4, help="stages to run in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would run")
+    parser.add_argument("--verbose", action="store_true", help="print every stage's output")
+    parser.add_argument("--list", action="store_true", help="list stages and exit")
+    parser.add_argument("--trace", help="record per-stage timings here (.json: Chrome trace, else JSON lines)")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies(STAGES)
+        for stage in STAGES:
+            after = ", ".join(sorted(deps[stage.name])) or "-"
+            print(f"{stage.name:26s} {stage.script:38s} after: {after}")
+        sys.exit(0)
+
+    targets = list(args.targets)
+    unknown = set(targets) - {s.name for s in STAGES}
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    print("\n" + "="*70)
+    print("F1 PIPELINE")
+    print("="*70 + "\n")
+
+    start = time.perf_counter()
+    results = run_pipeline(select(STAGES, targets, include_manual=args.fetch),
+                           jobs=args.jobs, force=args.force, dry_run=args.dry_run, verbose=args.verbose,
+                           trace=os.path.abspath(args.trace) if args.trace else None)
+    ran = sum(1 for r in results.values() if r == "ran")
+    cached = sum(1 for r in results.values() if r == "cached")
+    print(f"\n✓ {ran} stage(s) ran, {cached} up to date, in {time.perf_counter() - start:.1f}s")
+    sys.exit(1 if any(r in ("failed", "blocked") for r in results.values()) else 0)
@@ -3,16 +3,13 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import pickle
+from instrument import span
+from storage import read_stage, write_split
 
 print("\n" + "="*70)
 print("PREPARE DATA FOR MACHINE LEARNING")
 print("="*70)
 
-# Load cleaned data
-df = pd.read_csv("backend/data/f1_data_cleaned.csv")
-
-print(f"\nLoaded data: {len(df)} rows, {len(df.columns)} columns")
-
 # ============================================================
 # SELECT FEATURES FOR MACHINE LEARNING
 # ============================================================
@@ -49,6 +46,13 @@ print("\n" + "="*70)
 print("CREATE FEATURE MATRIX & TARGET")
 print("="*70)
 
+# Load only the columns we need from the cleaned data
+with span("load cleaned") as s:
+    df = read_stage('cleaned', columns=feature_columns + [target_column])
+    s.rows = len(df)
+
+print(f"\nLoaded data: {len(df)} rows, {len(df.columns)} columns")
+
 X = df[feature_columns].copy()
 y = df[target_column].copy()
 
@@ -70,12 +74,13 @@ print("\n" + "="*70)
 print("TRAIN-TEST SPLIT")
 print("="*70)
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
-    test_size=0.2,           # 20% for testing
-    random_state=42,         # For reproducibility
-    stratify=y               # Keep same class balance in train/test
-)
+with span("train/test split", rows=len(X)):
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y,
+        test_size=0.2,           # 20% for testing
+        random_state=42,         # For reproducibility
+        stratify=y               # Keep same class balance in train/test
+    )
 
 print(f"\nTraining set:")
 print(f"  X_train shape: {X_train.shape}")
@@ -95,9 +100,10 @@ print("\n" + "="*70)
 print("FEATURE SCALING (Standardization)")
 print("="*70)
 
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+with span("fit scaler", rows=len(X_train)):
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
 
 print("✓ Features scaled using StandardScaler")
 print(f"  Mean of scaled features: {X_train_scaled.mean():.6f} (should be ~0)")
@@ -115,17 +121,14 @@ print("\n" + "="*70)
 print("SAVING PREPARED DATA")
 print("="*70)
 
-# Save as CSV
-X_train_scaled.to_csv("backend/data/X_train_scaled.csv", index=False)
-X_test_scaled.to_csv("backend/data/X_test_scaled.csv", index=False)
-y_train.to_csv("backend/data/y_train.csv", index=False)
-y_test.to_csv("backend/data/y_test.csv", index=False)
+# Save to the Parquet store (features + target per split)
+with span("write splits", rows=len(X)):
+    write_split(X_train_scaled, y_train, 'train')
+    write_split(X_test_scaled, y_test, 'test')
 
 print("✓ Saved training/testing data:")
-print("  - X_train_scaled.csv")
-print("  - X_test_scaled.csv")
-print("  - y_train.csv")
-print("  - y_test.csv")
+print("  - store/train (X_train_scaled + y_train)")
+print("  - store/test (X_test_scaled + y_test)")
 
 # Save scaler object for later use (when making predictions)
 with open("backend/data/scaler.pkl", "wb") as f:
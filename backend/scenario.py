@@ -0,0 +1,160 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from history_index import history_index
+from inference import build_race_features
+
+# Base races kept in memory; a race's base is a few KB
+MAX_CACHED_RACES = 256
+
+# Override key -> the feature cells it changes
+OVERRIDE_FIELDS = {'grid_position', 'pit_lane', 'dnf', 'team'}
+
+
+class RaceBase:
+    """A race's unmodified features and probabilities, plus what overrides need to recompute cells"""
+
+    def __init__(self, history, bundle, season, rnd):
+        self.features = build_race_features(history, season, rnd)
+        # Scenarios may move a driver to a team the history has never seen
+        self.features['TeamName'] = self.features['TeamName'].astype(object)
+        self.probability = bundle.predict_proba(self.features)
+        self.rows = {name: i for i, name in enumerate(self.features['FullName'])}
+        self.index = history_index(history)
+        self.season = season
+        self.round = rnd
+
+    def team_win_percentage(self, team):
+        """Season-to-date win % of any team before this race (as in build_race_features)"""
+        value = self.index.team_win_percentage(team, self.season, self.round)
+        return 0.0 if np.isnan(value) else value
+
+
+def parse_overrides(entries):
+    """
+    Validate the overrides of a scenario request: a list of
+    {name, grid_position|pit_lane|dnf|team}. Raises ValueError on bad input.
+    """
+    if entries is None:
+        return []
+    if not isinstance(entries, list):
+        raise ValueError("overrides must be a list")
+    overrides = []
+    for entry in entries:
+        if not isinstance(entry, dict) or "name" not in entry:
+            raise ValueError("each override needs a name")
+        unknown = set(entry) - OVERRIDE_FIELDS - {"name"}
+        if unknown:
+            raise ValueError(f"unknown override field(s): {', '.join(sorted(unknown))}")
+        name = entry["name"]
+        if not isinstance(name, str) or not name:
+            raise ValueError("name must be a non-empty string")
+        override = dict(entry)
+        if "grid_position" in override:
+            position = override["grid_position"]
+            if isinstance(position, bool) or not isinstance(position, (int, float)) or not math.isfinite(position):
+                raise ValueError(f"grid_position of {name} must be a finite number")
+            override["grid_position"] = float(position)
+        for flag in ("pit_lane", "dnf"):
+            if flag in override and not isinstance(override[flag], bool):
+                raise ValueError(f"{flag} of {name} must be true or false")
+        if override.get("team") is not None and (not isinstance(override["team"], str) or not override["team"]):
+            raise ValueError(f"team of {name} must be a non-empty string")
+        overrides.append(override)
+    return overrides
+
+
+class ScenarioEngine:
+    """
+    What-if predictions on top of memoized base races.
+
+    The base features and probabilities of a (season, round) are built
+    once. A scenario copies them, rewrites only the cells its overrides
+    touch (GridPosition for grid changes and pit-lane starts,
+    team_win_percentage for team changes, read from the history index) and calls the model on the
+    changed rows only. A DNF is not a feature: the driver's probability
+    is set to 0. The memo is dropped when the history or model changes.
+    """
+
+    def __init__(self, max_races=MAX_CACHED_RACES):
+        self.max_races = max_races
+        self._bases = OrderedDict()
+        self._sources = (None, None)
+        self._lock = threading.Lock()
+
+    def base(self, history, bundle, season, rnd):
+        key = (season, rnd)
+        with self._lock:
+            if self._sources[0] is not history or self._sources[1] is not bundle:
+                self._bases.clear()
+                self._sources = (history, bundle)
+            base = self._bases.get(key)
+            if base is not None:
+                self._bases.move_to_end(key)
+                return base
+        base = RaceBase(history, bundle, season, rnd)
+        with self._lock:
+            if self._sources[0] is history and self._sources[1] is bundle:
+                self._bases[key] = base
+                while len(self._bases) > self.max_races:
+                    self._bases.popitem(last=False)
+        return base
+
+    def run(self, history, bundle, season, rnd, overrides=(), reverse_grid=False, predict=None):
+        """
+        The race's predictions under a scenario, sorted by probability.
+        Columns: the features, win_probability, base_probability and changed.
+
+        predict(bundle, features) scores the changed rows (bundle.predict_proba by default).
+        Raises KeyError for drivers that are not in the race's field and
+        ValueError for a grid_position outside 1..field size.
+        """
+        base = self.base(history, bundle, season, rnd)
+        features = base.features.copy()
+        probability = base.probability.copy()
+        changed = np.zeros(len(features), dtype=bool)
+        dnf = np.zeros(len(features), dtype=bool)
+        grid = features.columns.get_loc('GridPosition')
+        team_win = features.columns.get_loc('team_win_percentage')
+
+        if reverse_grid:
+            # Back of the grid to the front; ties keep their entry-list order
+            order = np.argsort(-features['GridPosition'].to_numpy(), kind='stable')
+            reversed_grid = np.empty(len(features))
+            reversed_grid[order] = np.arange(1, len(features) + 1)
+            changed |= features['GridPosition'].to_numpy() != reversed_grid
+            features['GridPosition'] = reversed_grid
+
+        for override in overrides:
+            if override['name'] not in base.rows:
+                raise KeyError(override['name'])
+            row = base.rows[override['name']]
+            if override.get('pit_lane'):
+                # A pit-lane start is a start from behind the whole field
+                features.iat[row, grid] = float(len(features) + 1)
+                changed[row] = True
+            elif 'grid_position' in override:
+                if not 1 <= override['grid_position'] <= len(features):
+                    raise ValueError(f"grid_position of {override['name']} must be between 1 and {len(features)}")
+                features.iat[row, grid] = override['grid_position']
+                changed[row] = True
+            if override.get('team'):
+                features.at[row, 'TeamName'] = override['team']
+                features.iat[row, team_win] = base.team_win_percentage(override['team'])
+                changed[row] = True
+            if override.get('dnf'):
+                dnf[row] = True
+
+        rescore = changed & ~dnf
+        if rescore.any():
+            rows = features[rescore]
+            probability[rescore] = (predict or (lambda b, f: b.predict_proba(f)))(bundle, rows)
+        probability[dnf] = 0.0
+
+        features['win_probability'] = probability
+        features['base_probability'] = base.probability
+        features['changed'] = changed | dnf
+        return features.sort_values('win_probability', ascending=False, kind='stable').reset_index(drop=True)
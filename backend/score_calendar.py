@@ -0,0 +1,77 @@
+import os
+import time
+
+import pyarrow as pa
+
+from f1_schedule import F1_SCHEDULE
+from instrument import span
+from las_vegas_predict import load_inputs, predict_calendar
+from storage import COLUMN_TYPES, has_dataset, read_stage, version_file, write_dataset
+
+# Stored under data/store/calendar_predictions/, one Season=YYYY/ partition per season
+CALENDAR_DATASET = 'calendar_predictions'
+# GridPosition is an average grid for future races, so keep it at full precision
+TABLE_TYPES = {**COLUMN_TYPES, 'GridPosition': pa.float64()}
+TABLE_COLUMNS = ['Season', 'Round', 'EventName', 'predicted_rank', 'FullName', 'TeamName', 'GridPosition',
+                 'win_probability']
+
+
+def score_calendar(history=None, bundle=None, schedule=F1_SCHEDULE):
+    """
+    Win probabilities for every race in the schedule, one row per driver,
+    sorted by race and then by probability (predicted_rank 1 = favourite).
+    """
+    calendar = predict_calendar(schedule, history, bundle)
+    calendar = calendar.sort_values(['Season', 'Round', 'win_probability'], ascending=[True, True, False],
+                                    kind='stable').reset_index(drop=True)
+    calendar['predicted_rank'] = calendar.groupby(['Season', 'Round']).cumcount() + 1
+    return calendar
+
+
+def calendar_is_current(inputs=()):
+    """Whether the stored table exists and was written after every existing input file"""
+    if not has_dataset(CALENDAR_DATASET):
+        return False
+    written = os.path.getmtime(version_file(CALENDAR_DATASET))
+    return all(os.path.getmtime(path) <= written for path in inputs if os.path.exists(path))
+
+
+def load_calendar(inputs=()):
+    """
+    The stored prediction table, or a fresh scoring if the batch job has
+    not run yet or any of `inputs` (history, model files) changed since
+    """
+    if calendar_is_current(inputs):
+        table = read_stage(CALENDAR_DATASET)
+        return table.sort_values(['Season', 'Round', 'predicted_rank'], kind='stable').reset_index(drop=True)
+    return score_calendar()[TABLE_COLUMNS]
+
+
+def index_calendar(table):
+    """{(season, round): that race's rows}, so a race is one dict lookup away"""
+    return {(int(season), int(rnd)): race.reset_index(drop=True)
+            for (season, rnd), race in table.groupby(['Season', 'Round'], sort=False)}
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("WHOLE-CALENDAR PREDICTIONS")
+    print("="*70)
+
+    with span("load inputs"):
+        history, bundle = load_inputs()
+
+    start = time.perf_counter()
+    with span("score calendar") as s:
+        calendar = score_calendar(history, bundle)
+        s.rows = len(calendar)
+    elapsed = time.perf_counter() - start
+    races = calendar[['Season', 'Round']].drop_duplicates()
+    print(f"\n✓ Scored {len(races)} races ({len(calendar)} driver rows) in {elapsed:.2f}s")
+
+    favourites = calendar[calendar['predicted_rank'] == 1]
+    print("\nPredicted winner of the latest races:")
+    print(favourites[['Season', 'Round', 'EventName', 'FullName', 'win_probability']].tail(5).to_string(index=False))
+
+    path = write_dataset(calendar[TABLE_COLUMNS], CALENDAR_DATASET, column_types=TABLE_TYPES)
+    print(f"\n✓ Saved the prediction table to {path}")
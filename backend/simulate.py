@@ -0,0 +1,145 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+PODIUM_POSITIONS = 3
+POINTS_POSITIONS = 10
+# Simulations per NumPy block; keeps each block's arrays to a few tens of MB
+CHUNK_SIZE = 100_000
+# Below this many simulations a thread pool costs more than it saves
+PARALLEL_THRESHOLD = 200_000
+# Added to a retired driver's key so retirements are classified behind every finisher
+DNF_PENALTY = np.float32(1e6)
+
+_pool = None
+
+
+def _get_pool(workers):
+    """
+    One thread pool per server process, created on first use and reused.
+    Threads rather than processes: forking the server would copy locks
+    held by its background threads (artifact watcher, batcher, metrics
+    flusher), and NumPy's sampling and sorting release the GIL anyway.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="simulate")
+    return _pool
+
+
+def simulate_block(log_strength, dnf_prob, n_sims, seed):
+    """
+    Sample n_sims finishing orders at once.
+
+    Finishing orders follow a Plackett-Luce model: adding Gumbel noise to
+    log-strengths and sorting gives each driver a win chance proportional
+    to its strength, then the same for 2nd place among the rest, and so on.
+    Each driver independently retires with probability dnf_prob.
+
+    Returns (counts, dnfs): counts[d, k] is how often driver d finished
+    in position k+1, and dnfs[d] how often driver d retired.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(log_strength)
+    counts = np.zeros(n * n, dtype=np.int64)
+    dnfs = np.zeros(n, dtype=np.int64)
+    slots = np.arange(n, dtype=np.int64)
+
+    for start in range(0, n_sims, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_sims - start)
+        u = rng.random((size, n), dtype=np.float32)
+        keys = log_strength - np.log(-np.log(u + np.float32(1e-12)))
+        retired = rng.random((size, n), dtype=np.float32) < dnf_prob
+        keys -= retired * DNF_PENALTY
+        order = np.argsort(-keys, axis=1)  # order[s, k] = driver finishing k-th
+        counts += np.bincount((order * n + slots).ravel(), minlength=n * n)
+        dnfs += retired.sum(axis=0)
+    return counts.reshape(n, n), dnfs
+
+
+def simulate(strength, dnf_prob, n_sims=100_000, seed=None, workers=None):
+    """
+    Position distribution for a field over n_sims simulated races.
+
+    strength: per-driver relative strength (e.g. model win probabilities)
+    dnf_prob: per-driver retirement probability in [0, 1]
+    Large runs are split into shards on a thread pool, each with its own
+    independent random stream.
+    """
+    strength = np.clip(np.asarray(strength, dtype=np.float64), 1e-9, None)
+    log_strength = np.log(strength / strength.sum()).astype(np.float32)
+    dnf_prob = np.clip(np.asarray(dnf_prob, dtype=np.float32), 0, 1)
+
+    workers = workers or os.cpu_count() or 1
+    shards = workers if n_sims >= PARALLEL_THRESHOLD and workers > 1 else 1
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    sizes = [n_sims // shards + (1 if i < n_sims % shards else 0) for i in range(shards)]
+
+    if shards == 1:
+        return simulate_block(log_strength, dnf_prob, n_sims, seeds[0])
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(simulate_block, log_strength, dnf_prob, size, s) for size, s in zip(sizes, seeds)]
+    counts, dnfs = 0, 0
+    for future in futures:
+        c, d = future.result()
+        counts, dnfs = counts + c, dnfs + d
+    return counts, dnfs
+
+
+def simulate_race(predictions, n_sims=100_000, seed=None, workers=None):
+    """
+    Simulate a race from predict_race() output (FullName, win_probability, driver_dnf_rate).
+
+    Returns one row per driver with the share of simulations in which they
+    won, reached the podium, finished in the points or retired. Across the
+    field the win column sums to 1, podium to 3 and points to 10.
+    """
+    counts, dnfs = simulate(predictions['win_probability'].to_numpy(),
+                            predictions['driver_dnf_rate'].to_numpy() / 100,
+                            n_sims, seed, workers)
+    share = counts / n_sims
+    positions = np.arange(1, share.shape[1] + 1)
+    result = pd.DataFrame({
+        'FullName': predictions['FullName'].to_numpy(),
+        'win': share[:, 0],
+        'podium': share[:, :PODIUM_POSITIONS].sum(axis=1),
+        'points_finish': share[:, :POINTS_POSITIONS].sum(axis=1),
+        'dnf': dnfs / n_sims,
+        'expected_position': share @ positions,
+    })
+    return result.sort_values('win', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from inference import predict_race
+    from las_vegas_predict import load_inputs
+
+    parser = argparse.ArgumentParser(description="Monte Carlo race simulation from model predictions")
+    parser.add_argument("--season", type=int, default=2025)
+    parser.add_argument("--round", type=int, default=21)
+    parser.add_argument("--sims", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    history, bundle = load_inputs()
+    predictions = predict_race(bundle, history, args.season, args.round)
+
+    print("\n" + "="*70)
+    print(f"RACE SIMULATION ({args.sims:,} races)")
+    print("="*70)
+
+    start = time.perf_counter()
+    result = simulate_race(predictions, args.sims, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✓ Simulated {args.sims:,} races in {elapsed:.2f}s")
+    print(f"  Sum of win probabilities:    {result['win'].sum():.4f}")
+    print(f"  Sum of podium probabilities: {result['podium'].sum():.4f}")
+    print(f"  Sum of points probabilities: {result['points_finish'].sum():.4f}\n")
+    print(result.head(15).to_string(index=False, float_format=lambda x: f"{x:.4f}"))
@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+# Explicit column types, so dtypes chosen in clean_data.py survive between stages
+COLUMN_TYPES = {
+    'Abbreviation': pa.string(),
+    'FullName': pa.string(),
+    'TeamName': pa.string(),
+    'Position': pa.float32(),
+    'GridPosition': pa.float32(),
+    'Points': pa.float32(),
+    'Status': pa.string(),
+    'Season': pa.int16(),
+    'Round': pa.int8(),
+    'RaceName': pa.string(),
+    'driver_recent_form': pa.float64(),
+    'driver_win_percentage': pa.float64(),
+    'team_win_percentage': pa.float64(),
+    'starting_position_quality': pa.float32(),
+    'driver_dnf_rate': pa.float64(),
+    'driver_podium_rate': pa.float64(),
+    'driver_races_competed': pa.int32(),
+    'is_winner': pa.int8(),
+}
+
+SEASON_PARTITIONING = ds.partitioning(pa.schema([('Season', pa.int16())]), flavor="hive")
+
+# Stage name -> CSV the stage used to write, read when the store has no copy yet
+LEGACY_CSV = {
+    'combined': "f1_all_races_combined.csv",
+    'features': "f1_features_engineered.csv",
+    'cleaned': "f1_data_cleaned.csv",
+}
+LEGACY_SPLIT_CSV = {
+    'train': ("X_train_scaled.csv", "y_train.csv"),
+    'test': ("X_test_scaled.csv", "y_test.csv"),
+}
+
+
+def dataset_path(name):
+    return os.path.join(STORE_DIR, name)
+
+
+def version_file(name):
+    """Rewritten after every write: watch this file to notice a new version"""
+    return os.path.join(STORE_DIR, f"{name}.version.json")
+
+
+def has_dataset(name):
+    return os.path.exists(version_file(name))
+
+
+def table_schema(df, column_types=COLUMN_TYPES):
+    """Arrow schema for a frame: column_types where known, inferred otherwise"""
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(f.name, column_types.get(f.name, f.type)) for f in inferred
+    ])
+
+
+def write_dataset(df, name, partition_by_season=True, seasons_only=False, column_types=COLUMN_TYPES):
+    """
+    Write a stage's output as Parquet under data/store/<name>/.
+
+    With partition_by_season the data is split into Season=YYYY/ directories.
+    seasons_only=True replaces just the seasons present in df and keeps the
+    others (used for appends); otherwise the whole dataset is replaced.
+    """
+    path = dataset_path(name)
+    table = pa.Table.from_pandas(df, schema=table_schema(df, column_types), preserve_index=False)
+
+    if not seasons_only and os.path.exists(path):
+        shutil.rmtree(path)
+
+    ds.write_dataset(
+        table, path,
+        format="parquet",
+        partitioning=SEASON_PARTITIONING if partition_by_season else None,
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+    rows = len(df)
+    if seasons_only:
+        # The kept seasons count too; Parquet footers hold the row counts
+        rows = ds.dataset(path, format="parquet",
+                          partitioning=SEASON_PARTITIONING if partition_by_season else None).count_rows()
+
+    with open(version_file(name), "w") as f:
+        json.dump({'rows': rows, 'columns': list(df.columns),
+                   'partitioned': partition_by_season, 'written_at': time.time()}, f)
+    return path
+
+
+def read_dataset(name, columns=None, seasons=None):
+    """
+    Read a stored dataset. Only the requested columns are decoded, and
+    only the Season=... directories in `seasons` are opened.
+    """
+    with open(version_file(name)) as f:
+        version = json.load(f)
+    dataset = ds.dataset(dataset_path(name), format="parquet",
+                         partitioning=SEASON_PARTITIONING if version['partitioned'] else None)
+    row_filter = None
+    if seasons is not None:
+        row_filter = ds.field('Season').isin([int(s) for s in seasons])
+    # Partition columns come back last, so restore the written column order
+    columns = list(columns) if columns is not None else version['columns']
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+
+def read_stage(name, columns=None, seasons=None):
+    """Read a pipeline stage's output: the Parquet store if present, else its legacy CSV"""
+    if has_dataset(name):
+        return read_dataset(name, columns, seasons)
+
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + (['Season'] if seasons is not None else [])))
+    df = pd.read_csv(os.path.join(DATA_DIR, LEGACY_CSV[name]), usecols=usecols)
+    if seasons is not None:
+        df = df[df['Season'].isin(list(seasons))].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def write_split(X, y, name):
+    """Store a scaled train/test split (features + target in one unpartitioned dataset)"""
+    df = X.reset_index(drop=True).copy()
+    df[y.name] = y.reset_index(drop=True)
+    return write_dataset(df, name, partition_by_season=False,
+                         column_types={y.name: COLUMN_TYPES.get(y.name, pa.int64())})
+
+
+def read_split(name, target_column='is_winner'):
+    """(X, y) for 'train' or 'test', from the store or the legacy CSV pair"""
+    if has_dataset(name):
+        df = read_dataset(name)
+        return df.drop(columns=[target_column]), df[target_column]
+    x_file, y_file = LEGACY_SPLIT_CSV[name]
+    X = pd.read_csv(os.path.join(DATA_DIR, x_file))
+    y = pd.read_csv(os.path.join(DATA_DIR, y_file)).squeeze()
+    return X, y
@@ -0,0 +1,233 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from fetch_race_data import RESULT_COLUMNS, race_file
+from storage import table_schema
+
+COLUMNS = RESULT_COLUMNS + ['Season', 'Round', 'RaceName']
+POINTS = np.array([25, 18, 15, 12, 10, 8, 6, 4, 2, 1], dtype=np.float64)
+
+# Statuses and their rough shares in the real data
+RETIREMENTS = ['Retired', 'Collision', 'Accident', 'Collision damage', 'Power Unit', 'Engine',
+               'Gearbox', 'Brakes', 'Did not start', 'Disqualified']
+RETIREMENT_WEIGHTS = np.array([137, 39, 21, 20, 13, 12, 10, 6, 9, 9], dtype=np.float64)
+LAPPED = ['+1 Lap', 'Lapped', '+2 Laps', '+3 Laps']
+LAPPED_WEIGHTS = np.array([270, 279, 37, 6], dtype=np.float64)
+
+# Seasons are buffered into Parquet row groups of about this many rows
+ROW_GROUP_ROWS = 100_000
+
+
+class SeasonGenerator:
+    """
+    Generates race results one season at a time.
+
+    Each driver has a skill and each team a car; both are latent normal
+    values. Qualifying ranks car + skill + noise into the grid, and the
+    race ranks car + skill + a pull towards the grid + noise into the
+    finishing order, so grid and finish correlate the way they do in the
+    real data (Spearman ~0.6-0.7, pole wins about half the races).
+    Between seasons cars drift, some drivers are replaced by newcomers,
+    some seats are swapped and some teams are rebranded.
+    """
+
+    def __init__(self, field_size=20, driver_churn=0.15, team_churn=0.1, dnf_rate=0.12,
+                 grid_weight=1.0, race_noise=0.6, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.field_size = field_size
+        self.n_teams = max(field_size // 2, 1)
+        self.driver_churn = driver_churn
+        self.team_churn = team_churn
+        self.dnf_rate = dnf_rate
+        self.grid_weight = grid_weight
+        self.race_noise = race_noise
+
+        self.next_driver = 0
+        self.next_team = 0
+        self.team_names = np.array([self._new_team() for _ in range(self.n_teams)], dtype=object)
+        self.car = self.rng.normal(0, 1, self.n_teams)
+        self.reliability = self.rng.uniform(0.6, 1.4, self.n_teams)
+        self.drivers = np.array([self._new_driver() for _ in range(field_size)])
+        self.skill = self.rng.normal(0, 0.5, field_size)
+        # Seat i belongs to team i % n_teams
+        self.seat_team = np.arange(field_size) % self.n_teams
+
+    def _new_driver(self):
+        self.next_driver += 1
+        return self.next_driver
+
+    def _new_team(self):
+        self.next_team += 1
+        return f"Team {self.next_team:03d}"
+
+    def _churn(self):
+        rng = self.rng
+        # Newcomers take over some seats
+        replaced = rng.random(self.field_size) < self.driver_churn
+        for seat in np.flatnonzero(replaced):
+            self.drivers[seat] = self._new_driver()
+            self.skill[seat] = rng.normal(-0.2, 0.5)
+        # Some of the remaining drivers swap seats
+        movers = np.flatnonzero(~replaced & (rng.random(self.field_size) < self.driver_churn))
+        if len(movers) > 1:
+            order = rng.permutation(movers)
+            self.drivers[movers], self.skill[movers] = self.drivers[order], self.skill[order]
+        # Cars drift; some teams are rebranded (new name, same car)
+        self.car = 0.7 * self.car + rng.normal(0, 0.7, self.n_teams)
+        for team in np.flatnonzero(rng.random(self.n_teams) < self.team_churn):
+            self.team_names[team] = self._new_team()
+
+    def season(self, season, rounds, churn=True):
+        """One season as a DataFrame in the fetch_race_data.py column layout"""
+        if churn:
+            self._churn()
+        rng = self.rng
+        n = self.field_size
+        strength = self.car[self.seat_team] + self.skill
+
+        quali = strength + rng.normal(0, 0.5, (rounds, n))
+        grid = np.argsort(np.argsort(-quali, axis=1), axis=1) + 1.0
+        # Occasional pit-lane starts are recorded as grid 0
+        grid[rng.random((rounds, n)) < 0.012] = 0.0
+
+        grid_pull = -self.grid_weight * (np.where(grid == 0, n, grid) - (n + 1) / 2) / n * 4
+        pace = strength + grid_pull + rng.normal(0, self.race_noise, (rounds, n))
+        dnf_prob = np.clip(self.dnf_rate * self.reliability[self.seat_team], 0, 1)
+        retired = rng.random((rounds, n)) < dnf_prob
+        # Retirements are classified behind every finisher
+        pace = np.where(retired, -1e6 + pace, pace)
+        position = np.argsort(np.argsort(-pace, axis=1), axis=1) + 1
+
+        points = np.where(retired | (position > len(POINTS)), 0.0, POINTS[np.minimum(position, len(POINTS)) - 1])
+
+        status = np.full((rounds, n), 'Finished', dtype=object)
+        lead_lap = rng.integers(max(n // 3, 1), n + 1, (rounds, 1))
+        lapped = ~retired & (position > lead_lap)
+        status[lapped] = rng.choice(LAPPED, lapped.sum(), p=LAPPED_WEIGHTS / LAPPED_WEIGHTS.sum())
+        status[retired] = rng.choice(RETIREMENTS, retired.sum(), p=RETIREMENT_WEIGHTS / RETIREMENT_WEIGHTS.sum())
+
+        drivers = np.tile(self.drivers, rounds)
+        return pd.DataFrame({
+            'Abbreviation': [abbreviation(d) for d in drivers],
+            'FullName': [f"Driver {d:05d}" for d in drivers],
+            'TeamName': np.tile(self.team_names[self.seat_team], rounds),
+            'Position': position.ravel().astype(np.float64),
+            'GridPosition': grid.ravel(),
+            'Points': points.ravel(),
+            'Status': status.ravel(),
+            'Season': season,
+            'Round': np.repeat(np.arange(1, rounds + 1), n),
+            'RaceName': 'Race',
+        }, columns=COLUMNS)
+
+
+def abbreviation(driver_id):
+    """Three capital letters derived from the id, like 'VER'"""
+    letters = []
+    for _ in range(3):
+        driver_id, r = divmod(driver_id, 26)
+        letters.append(chr(ord('A') + r))
+    return ''.join(reversed(letters))
+
+
+def generate_seasons(seasons=6, rounds=22, start_season=2020, seed=None, **options):
+    """Yield one DataFrame per season; only one season is in memory at a time"""
+    generator = SeasonGenerator(seed=seed, **options)
+    for i in range(seasons):
+        yield generator.season(start_season + i, rounds, churn=i > 0)
+
+
+def synthetic_history(seasons=6, rounds=22, start_season=2020, seed=None, **options):
+    """A whole synthetic history in memory, for benchmarks at moderate sizes"""
+    return pd.concat(generate_seasons(seasons, rounds, start_season, seed, **options), ignore_index=True)
+
+# ============================================================
+# Writers: per-race CSVs (like fetch_race_data.py), one CSV or Parquet
+# ============================================================
+
+def write_races(frames, output):
+    os.makedirs(output, exist_ok=True)
+    rows = 0
+    for df in frames:
+        for (season, rnd), race in df.groupby(['Season', 'Round'], sort=False):
+            race.to_csv(race_file(season, rnd, output), index=False)
+        rows += len(df)
+    return rows
+
+
+def write_csv(frames, output):
+    rows = 0
+    with open(output, "w", newline="") as f:
+        for df in frames:
+            df.to_csv(f, index=False, header=rows == 0)
+            rows += len(df)
+    return rows
+
+
+def write_parquet(frames, output, row_group_rows=ROW_GROUP_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    pending = []
+
+    def flush():
+        nonlocal writer
+        df = pd.concat(pending, ignore_index=True)
+        table = pa.Table.from_pandas(df, schema=table_schema(df), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output, table.schema)
+        writer.write_table(table)
+        pending.clear()
+
+    try:
+        for df in frames:
+            pending.append(df)
+            rows += len(df)
+            if sum(len(p) for p in pending) >= row_group_rows:
+                flush()
+        if pending:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+WRITERS = {'races': write_races, 'csv': write_csv, 'parquet': write_parquet}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic race results with the fetched data's columns")
+    parser.add_argument("output", help="folder (--format races) or file to write")
+    parser.add_argument("--format", choices=list(WRITERS), default='csv',
+                        help="races: one f1_<season>_race_<round>.csv per race, as fetch_race_data.py writes")
+    parser.add_argument("--seasons", type=int, default=100)
+    parser.add_argument("--start-season", type=int, default=2020)
+    parser.add_argument("--rounds", type=int, default=22, help="rounds per season (at most 99)")
+    parser.add_argument("--field-size", type=int, default=20)
+    parser.add_argument("--driver-churn", type=float, default=0.15, help="share of seats changing hands per season")
+    parser.add_argument("--team-churn", type=float, default=0.1, help="share of teams rebranded per season")
+    parser.add_argument("--dnf-rate", type=float, default=0.12)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if not 1 <= args.rounds <= 99:
+        parser.error("--rounds must be between 1 and 99")
+
+    print("\n" + "="*70)
+    print("SYNTHETIC RACE HISTORY")
+    print("="*70)
+
+    frames = generate_seasons(args.seasons, args.rounds, args.start_season, args.seed,
+                              field_size=args.field_size, driver_churn=args.driver_churn,
+                              team_churn=args.team_churn, dnf_rate=args.dnf_rate)
+    start = time.perf_counter()
+    rows = WRITERS[args.format](frames, args.output)
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Wrote {rows:,} rows ({args.seasons} seasons x {args.rounds} rounds x {args.field_size} drivers)"
+          f" to {args.output} in {elapsed:.1f}s")
@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import randint, uniform
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GroupKFold, HalvingRandomSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from history_index import race_keys
+from storage import DATA_DIR, read_stage
+
+CACHE_DIR = os.path.join(DATA_DIR, "tune_cache")
+RESULTS_FILE = os.path.join(DATA_DIR, "tuning_results.csv")
+# model.py trains with these when the file exists
+BEST_PARAMS_FILE = os.path.join(DATA_DIR, "best_params.json")
+
+FEATURE_COLUMNS = os.path.join(DATA_DIR, "feature_columns.pkl")
+TARGET_COLUMN = 'is_winner'
+
+# Sampled for each candidate; n_estimators is the halving resource instead
+PARAM_DISTRIBUTIONS = {
+    'model__max_depth': [5, 8, 10, 15, 20, None],
+    'model__min_samples_split': randint(2, 30),
+    'model__min_samples_leaf': randint(1, 15),
+    'model__max_features': ['sqrt', 'log2', None, 0.5],
+    'model__class_weight': ['balanced', 'balanced_subsample', None],
+    'model__max_samples': uniform(0.5, 0.5),
+}
+
+
+def load_data():
+    """Feature matrix, target and race keys from the cleaned history"""
+    with open(FEATURE_COLUMNS, "rb") as f:
+        feature_columns = pickle.load(f)
+    df = read_stage('cleaned', columns=['Season', 'Round'] + feature_columns + [TARGET_COLUMN])
+    df = df.sort_values(['Season', 'Round'], kind='stable').reset_index(drop=True)
+    return df[feature_columns], df[TARGET_COLUMN].to_numpy(), df[['Season', 'Round']]
+
+
+def make_groups(races, group_by):
+    """One group per race, or per season: a race's drivers never straddle train and validation"""
+    # int64 either way: the store's int16/int8 Season and Round would wrap in Season * 100 + Round
+    if group_by == 'season':
+        return races['Season'].to_numpy(dtype=np.int64)
+    return race_keys(races['Season'], races['Round'])
+
+
+def cached_folds(groups, n_splits):
+    """
+    Grouped CV splits, saved under tune_cache keyed by the groups array so
+    later runs on the same data reuse them instead of re-splitting.
+    """
+    n_splits = min(n_splits, len(np.unique(groups)))
+    key = hashlib.sha256(groups.tobytes() + str(n_splits).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"folds_{key}.npz")
+    if os.path.exists(path):
+        saved = np.load(path)
+        return [(saved[f"train_{i}"], saved[f"test_{i}"]) for i in range(n_splits)]
+
+    folds = list(GroupKFold(n_splits=n_splits).split(groups, groups=groups))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    arrays = {}
+    for i, (train, test) in enumerate(folds):
+        arrays[f"train_{i}"], arrays[f"test_{i}"] = train, test
+    np.savez(path, **arrays)
+    return folds
+
+
+def build_search(folds, n_candidates, max_trees, scoring, workers, seed):
+    """
+    Successive halving over random candidates: every candidate starts with
+    a few trees, and only the best third of each round moves on with three
+    times as many.
+
+    The scaler sits in a Pipeline with a joblib memory, so each fold's
+    scaler is fitted once and reused by every candidate and every round.
+    """
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('model', RandomForestClassifier(random_state=seed, n_jobs=1)),
+    ], memory=os.path.join(CACHE_DIR, "pipeline"))
+    return HalvingRandomSearchCV(
+        pipeline,
+        PARAM_DISTRIBUTIONS,
+        n_candidates=n_candidates,
+        resource='model__n_estimators',
+        # Smallest forest that lets the final round train max_trees
+        min_resources='exhaust',
+        max_resources=max_trees,
+        factor=3,
+        cv=folds,
+        scoring=scoring,
+        n_jobs=workers,
+        random_state=seed,
+        refit=False,
+    )
+
+
+def results_table(search):
+    """One row per candidate per halving round, best final-round configs first"""
+    results = pd.DataFrame(search.cv_results_)
+    params = pd.json_normalize(results['params']).rename(columns=lambda c: c.replace('model__', ''))
+    table = pd.concat([
+        results[['iter', 'n_resources', 'mean_test_score', 'std_test_score', 'mean_fit_time']],
+        params.drop(columns=['n_estimators'], errors='ignore'),
+    ], axis=1).rename(columns={'n_resources': 'n_estimators'})
+    return table.sort_values(['iter', 'mean_test_score'], ascending=False).reset_index(drop=True)
+
+
+def best_params(search):
+    params = {k.replace('model__', ''): v for k, v in search.best_params_.items()}
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grouped-CV hyperparameter search for the random forest")
+    parser.add_argument("--group-by", choices=['race', 'season'], default='race',
+                        help="keep whole races or whole seasons on one side of each split")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=81, help="configs sampled for the first round")
+    parser.add_argument("--max-trees", type=int, default=300, help="trees given to the final round")
+    parser.add_argument("--scoring", default='neg_log_loss')
+    parser.add_argument("--workers", type=int, default=-1, help="processes for fitting (-1: all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("HYPERPARAMETER SEARCH (grouped CV + successive halving)")
+    print("="*70)
+
+    X, y, races = load_data()
+    groups = make_groups(races, args.group_by)
+    folds = cached_folds(groups, args.folds)
+    print(f"\nLoaded {len(X)} rows, {len(np.unique(groups))} {args.group_by} groups, {len(folds)} folds")
+
+    search = build_search(folds, args.candidates, args.max_trees, args.scoring, args.workers, args.seed)
+    start = time.perf_counter()
+    search.fit(X, y)
+    elapsed = time.perf_counter() - start
+
+    fits = sum(search.n_candidates_) * len(folds)
+    print(f"\n✓ {search.n_iterations_} halving rounds, {fits} fits in {elapsed:.1f}s")
+    for i, (n, r) in enumerate(zip(search.n_candidates_, search.n_resources_)):
+        print(f"  Round {i}: {n:3d} candidates x {r:3d} trees")
+
+    table = results_table(search)
+    table.to_csv(RESULTS_FILE, index=False)
+    print(f"\n✓ Saved results to {RESULTS_FILE}")
+
+    params = best_params(search)
+    with open(BEST_PARAMS_FILE, "w") as f:
+        json.dump(params, f, indent=1)
+    print(f"✓ Best {args.scoring}: {search.best_score_:.4f}")
+    print(f"✓ Saved best parameters to {BEST_PARAMS_FILE}")
+    for name, value in params.items():
+        print(f"  {name:20s}: {value}")
@@ -1,8 +1,8 @@
-import pandas as pd
+from storage import read_stage
 import matplotlib.pyplot as plt
 
 # Load data
-df = pd.read_csv("backend/data/f1_all_races_combined.csv")
+df = read_stage('combined')
 
 # Get top winners
 winners = df[df['Position'] == 1.0]
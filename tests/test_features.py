@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from benchmark_features import PAIRS, scale_up
+from entities import load_entities
+from storage import read_stage
+
+
+@pytest.fixture(scope="module")
+def combined():
+    df = read_stage('combined')
+    return df.sort_values(['Season', 'Round']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("factor", [1, 3])
+@pytest.mark.parametrize("categorize", [False, True], ids=["strings", "categoricals"])
+@pytest.mark.parametrize("name, loop_fn, grouped_fn", PAIRS, ids=[name for name, _, _ in PAIRS])
+def test_grouped_features_match_loop_versions(combined, factor, categorize, name, loop_fn, grouped_fn):
+    """The grouped features.py functions give the reference loop's values, also on a longer history"""
+    df = combined if factor == 1 else scale_up(combined, factor)
+    if categorize:
+        # As features.py runs them
+        df = load_entities().categorize(df)
+    expected = df['FullName'].astype(str).map(loop_fn(df))
+    actual = df['FullName'].astype(str).map(grouped_fn(df))
+    pd.testing.assert_series_equal(actual, expected, check_names=False, rtol=1e-12)